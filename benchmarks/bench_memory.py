@@ -0,0 +1,119 @@
+"""
+Peak memory per page for the preprocessing -> OCR backend handoff.
+
+"legacy" reproduces the previous handoff: PIL -> np.array(img.convert('L'))
+-> out-of-place thresholding -> Image.fromarray -> image encoded for the
+backend (BMP in memory for tesserocr's SetImage, PNG for pytesseract).
+"current" is what OCREngine does now: one grayscale NumPy buffer through
+ImageProcessor.process_image_for_ocr, handed to Tesseract as raw bytes.
+
+Each measurement runs in a fresh interpreter. The script reports the growth
+of peak resident memory (ru_maxrss) over a baseline taken after the page
+was created; that is the number that matters. The tracemalloc peak is shown
+for reference only: it sees Python objects and NumPy buffers, not memory
+allocated inside OpenCV or Pillow.
+
+Usage: python benchmarks/bench_memory.py [--dpi 300] [--color]
+Linux/macOS only (uses the resource module).
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024 # bytes on macOS, KiB on Linux
+
+
+def make_page(dpi, color):
+    import cv2
+    import numpy as np
+    from PIL import Image
+
+    height, width = int(11.69 * dpi), int(8.27 * dpi) # A4 portrait
+    page = np.full((height, width), 235, np.uint8)
+    line_height = max(8, dpi // 10)
+    for top in range(line_height * 2, height - line_height * 2, line_height * 2):
+        cv2.putText(page, "The quick brown fox jumps over the lazy dog " * 3, (line_height, top),
+                    cv2.FONT_HERSHEY_SIMPLEX, line_height / 30, 20, max(1, line_height // 12))
+    img = Image.fromarray(page)
+    return img.convert("RGB") if color else img
+
+
+def legacy(img, processor):
+    import cv2
+    import numpy as np
+    from PIL import Image
+
+    img_np = np.array(img.convert('L'))
+    cv2.normalize(img_np, img_np, 0, 255, cv2.NORM_MINMAX)
+    img_np = processor.denoise(img_np, *processor.choose_denoise(img_np))
+    img_np = cv2.adaptiveThreshold(img_np, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+    processed = Image.fromarray(img_np)
+    bmp = io.BytesIO()
+    processed.save(bmp, "BMP") # What tesserocr's SetImage() does with a PIL image
+    png = io.BytesIO()
+    processed.save(png, "PNG") # What pytesseract writes to its temp file
+    return len(bmp.getvalue()) + len(png.getvalue())
+
+
+def current(img, processor):
+    processed = processor.process_image_for_ocr(img, enable_adaptive_threshold=True)
+    return len(processed.tobytes()) # TesserocrBackend hands Tesseract the raw pixel bytes
+
+
+def measure(variant, dpi, color):
+    sys.path.insert(0, REPO_ROOT)
+    import ocr_engine
+
+    processor = ocr_engine.ImageProcessor()
+    run = {"legacy": legacy, "current": current}[variant]
+    run(make_page(72, color), processor) # Warm up: OpenCV/Pillow one-off allocations are not per page
+    img = make_page(dpi, color)
+    baseline = peak_rss_mb()
+    tracemalloc.start()
+    run(img, processor)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rss_mb": peak_rss_mb() - baseline, "traced_mb": traced_peak / 1024 / 1024,
+            "pixels": img.size[0] * img.size[1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dpi", type=int, default=300, help="page resolution (A4)")
+    parser.add_argument("--color", action="store_true", help="start from an RGB page instead of grayscale")
+    parser.add_argument("--child", choices=["legacy", "current"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.dpi, args.color)))
+        return
+
+    results = {}
+    for variant in ("legacy", "current"):
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", variant, "--dpi", str(args.dpi)]
+        if args.color:
+            cmd.append("--color")
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results[variant] = json.loads(output.strip().splitlines()[-1])
+
+    megapixels = results["current"]["pixels"] / 1e6
+    print(f"A4 @ {args.dpi} dpi ({megapixels:.1f} MP, {'RGB' if args.color else 'grayscale'} input)")
+    print(f"{'variant':<10} {'peak RSS growth':>16} {'tracemalloc peak':>17}")
+    for variant, result in results.items():
+        print(f"{variant:<10} {result['rss_mb']:>13.1f} MB {result['traced_mb']:>14.1f} MB")
+    saved = results["legacy"]["rss_mb"] - results["current"]["rss_mb"]
+    print(f"Peak RSS saved per page: {saved:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark the deskew rotation: ImageProcessor.rotate (OpenCV warpAffine)
+against the old scipy.ndimage rotate path, on grayscale pages at common scan
+resolutions.
+
+Usage: python benchmarks/bench_rotation.py [--angle 2.5] [--repeat 5]
+scipy is optional; without it only the warpAffine timings are shown.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A4 portrait at common scan resolutions
+PAGE_SIZES = {
+    "A4 @ 150 dpi": (1754, 1240),
+    "A4 @ 300 dpi": (3508, 2480),
+    "A4 @ 600 dpi": (7016, 4961),
+}
+
+
+def make_page(height, width):
+    """A white page with rows of dark text-like bars."""
+    page = np.full((height, width), 255, np.uint8)
+    line_height = max(8, height // 80)
+    for top in range(line_height * 2, height - line_height * 2, line_height * 2):
+        cv2.putText(page, "The quick brown fox jumps over the lazy dog " * 4, (line_height, top),
+                    cv2.FONT_HERSHEY_SIMPLEX, line_height / 30, 0, max(1, line_height // 12))
+    return page
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--angle", type=float, default=2.5, help="rotation in degrees")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    try:
+        from scipy import ndimage
+    except ImportError:
+        ndimage = None
+        print("scipy not installed: skipping the scipy.ndimage.rotate column\n")
+
+    sys.path.insert(0, REPO_ROOT)
+    from ocr_engine import ImageProcessor
+    processor = ImageProcessor()
+    print(f"{'page':<14} {'pixels':>8} {'warp nearest':>13} {'warp linear':>12} {'warp cubic':>11} {'scipy':>10}")
+    for name, (height, width) in PAGE_SIZES.items():
+        page = make_page(height, width)
+        row = [f"{name:<14}", f"{page.size / 1e6:>7.1f}M"]
+        # Exactly what DeskewStage runs, output allocation included
+        for interpolation, col in (('nearest', 13), ('linear', 12), ('cubic', 11)):
+            ms = best_time(lambda: processor.rotate(page, args.angle, interpolation), args.repeat)
+            row.append(f"{ms:>{col - 3}.1f} ms")
+        if ndimage is not None:
+            # The previous deskew call (mode='nearest' replicates the border like BORDER_REPLICATE)
+            ms = best_time(lambda: ndimage.rotate(page, args.angle, reshape=False, mode='nearest'), args.repeat)
+            row.append(f"{ms:>7.1f} ms")
+        else:
+            row.append(f"{'-':>10}")
+        print(" ".join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2763 @@
+"""
+Headless OCR engine behind ocr_gui.py: preprocessing, the Tesseract
+backends, result caching, PDF extraction and streaming, the exporters and
+a command line. Nothing here imports tkinter, and pytesseract, langdetect
+and PyMuPDF are imported on first use, so batch jobs and PDF worker
+processes start quickly and need no display.
+"""
+import os
+import sys
+from pathlib import Path
+import subprocess
+import platform
+import tempfile
+import threading
+import json
+import re
+import io
+import hashlib
+import time
+from datetime import datetime
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Large drawings and posters are legitimate input here; they are tiled rather than refused
+Image.MAX_IMAGE_PIXELS = 1_000_000_000
+
+def as_gray_array(img):
+    """
+    8-bit grayscale NumPy array for a PIL image or NumPy array, copying only
+    when a conversion is needed: grayscale arrays are returned as they are,
+    PIL images as a read-only array over one copy of their pixels.
+    """
+    if isinstance(img, np.ndarray):
+        if img.ndim == 3:
+            code = cv2.COLOR_RGBA2GRAY if img.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            return cv2.cvtColor(img, code)
+        return img
+    if img.mode != 'L':
+        img = img.convert('L')
+    return np.asarray(img) # Pillow buffers cannot be shared, so this is the one copy
+
+def inplace_dst(img_np):
+    """dst argument for OpenCV calls that may overwrite img_np (None when it is read-only)."""
+    return img_np if img_np.flags.writeable else None
+
+def image_size(img):
+    """(width, height) of a PIL image or NumPy array."""
+    if isinstance(img, np.ndarray):
+        return img.shape[1], img.shape[0]
+    return img.size
+
+def pixmap_to_array(pix):
+    """
+    Read-only NumPy array over the samples of a PyMuPDF Pixmap, with no
+    image encoding in between: 2-D for grayscale, HxWx3 for RGB. CMYK and
+    other colourspaces are converted straight to grayscale by MuPDF; alpha
+    is flattened onto white.
+    """
+    import fitz  # PyMuPDF
+    if pix.colorspace is not None and pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csGRAY, pix) # One conversion, one byte per pixel
+    # Rows may be padded beyond width * n bytes; slicing by stride keeps this a view
+    samples = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+    samples = samples[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+    colors = pix.n - pix.alpha
+    if colors == 0:
+        return 255 - samples[:, :, 0] # Image mask: opaque means ink
+    img = samples[:, :, 0] if colors == 1 else samples[:, :, :3]
+    if pix.alpha:
+        # Samples are premultiplied (c <= alpha), so on white each channel is c + 255 - alpha
+        transparency = 255 - samples[:, :, colors]
+        img = img + (transparency[:, :, None] if colors == 3 else transparency)
+    return img
+
+def pdf_image_placements(page, img):
+    """
+    Where a page.get_images() entry is drawn on the page, as (rect, transform)
+    pairs; transform maps the image's unit square to page space. Taken from
+    page.get_image_info(), which PyMuPDF computes once per page, by matching
+    the image size. Only when several images on the page share that size
+    does it fall back to page.get_image_rects(), which decodes images to
+    tell them apart.
+    """
+    import fitz  # PyMuPDF
+    size = (img[2], img[3])
+    if sum(1 for other in page.get_images() if (other[2], other[3]) == size) > 1:
+        return page.get_image_rects(img[0], transform=True)
+    return [(fitz.Rect(info['bbox']), fitz.Matrix(info['transform']))
+            for info in page.get_image_info() if (info['width'], info['height']) == size]
+
+def decode_jpeg_gray(data, size=None):
+    """
+    Decode JPEG bytes straight to a grayscale array. YCbCr JPEGs only decode
+    their luminance; with size (width, height), libjpeg's DCT scaling (PIL
+    draft mode) decodes at the smallest 1/2, 1/4 or 1/8 scale that is still
+    at least that large. Returns None for JPEGs that are not grayscale or
+    YCbCr (CMYK, ...), which are left to MuPDF.
+    """
+    img = Image.open(io.BytesIO(data))
+    if img.format != 'JPEG' or img.mode not in ('L', 'RGB'):
+        return None
+    img.draft('L', size or img.size)
+    return np.asarray(img.convert('L')) # No-op when draft already gave 'L'
+
+# Share of an embedded image's ink under text-layer words at which PDF mode 'hybrid'
+# skips its OCR; from TEXT_LAYER_PARTIAL up, only the uncovered part is OCR'd
+TEXT_LAYER_COVERED = 0.9
+TEXT_LAYER_PARTIAL = 0.1
+
+def text_layer_coverage(img, placements, words):
+    """
+    How much of an embedded image the page's text layer already covers.
+    placements are (rect, transform) pairs from pdf_image_placements();
+    words come from page.get_text("words"). Returns the fraction of the
+    image's ink (dark pixels) that lies under a word box, and a boolean mask
+    of the covered pixels (None when nothing is covered).
+    """
+    import fitz  # PyMuPDF
+    gray = as_gray_array(img)
+    height, width = gray.shape
+    covered = np.zeros((height, width), np.uint8)
+    for rect, transform in placements:
+        if abs(transform.a * transform.d - transform.b * transform.c) < 1e-9:
+            continue # Degenerate placement
+        to_unit = ~transform # Page space -> the image's unit square
+        for x0, y0, x1, y1, *_ in words:
+            word = fitz.Rect(x0, y0, x1, y1)
+            if not word.intersects(rect):
+                continue
+            pad = word.height * 0.2 # Glyph ink can overhang the word box a little
+            corners = [fitz.Point(x, y) * to_unit
+                       for x in (x0 - pad, x1 + pad) for y in (y0 - pad, y1 + pad)]
+            left = max(0, int(min(c.x for c in corners) * width))
+            right = min(width, int(np.ceil(max(c.x for c in corners) * width)))
+            top = max(0, int(min(c.y for c in corners) * height))
+            bottom = min(height, int(np.ceil(max(c.y for c in corners) * height)))
+            if left < right and top < bottom:
+                covered[top:bottom, left:right] = 1
+    if not covered.any():
+        return 0.0, None
+
+    threshold, _ = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    ink = gray < threshold
+    ink_pixels = np.count_nonzero(ink)
+    if ink_pixels == 0:
+        return 0.0, None
+    covered = covered.astype(bool)
+    return np.count_nonzero(ink & covered) / ink_pixels, covered
+
+# Pixel interpolation choices for the deskew rotation (OCROptions.deskew_interpolation)
+ROTATION_INTERPOLATION = {
+    'nearest': cv2.INTER_NEAREST,
+    'linear': cv2.INTER_LINEAR,
+    'cubic': cv2.INTER_CUBIC,
+}
+
+class ImageProcessor:
+    """Handles various image preprocessing tasks."""
+
+    def __init__(self):
+        pass
+
+    def estimate_text_height(self, img_np, analysis_size=2000, min_components=20):
+        """
+        Cheap estimate of the typical character height in img_np (pixels), from
+        connected-component statistics on a downsampled binarized copy.
+        Returns None when there are too few character-like components.
+        """
+        h, w = img_np.shape[:2]
+        scale = min(1.0, analysis_size / max(h, w))
+        small = cv2.resize(img_np, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA) if scale < 1.0 else img_np
+        _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        heights = stats[1:, cv2.CC_STAT_HEIGHT] # Row 0 is the background
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        # Character-like: not specks, not rules/frames, not huge blobs
+        is_char = (heights >= 3) & (areas >= 6) & (widths <= 4 * heights) & (heights <= small.shape[0] // 10)
+        if np.count_nonzero(is_char) < min_components:
+            return None
+        return float(np.median(heights[is_char])) / scale
+
+    def normalization_scale(self, img_np, target_text_height, report=None, min_scale=0.25, max_scale=3.0):
+        """
+        Scale factor that brings the typical character height of img_np close
+        to target_text_height, where Tesseract is fastest and most accurate.
+        Oversized scans are shrunk, tiny screenshots enlarged; images already
+        within ~25% of the target, or without measurable text, get 1.0.
+        """
+        text_height = self.estimate_text_height(img_np)
+        scale = 1.0
+        if text_height:
+            scale = min(max_scale, max(min_scale, target_text_height / text_height))
+            if 0.8 <= scale <= 1.25:
+                scale = 1.0
+        if report is not None:
+            report['text_height'] = text_height
+            report['scale'] = scale
+        return scale
+
+    def rescale(self, img_np, scale):
+        """Resize img_np by scale (INTER_AREA to shrink, INTER_CUBIC to enlarge)."""
+        if scale == 1.0:
+            return img_np
+        h, w = img_np.shape[:2]
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+        return cv2.resize(img_np, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=interpolation)
+
+    def estimate_noise(self, img_np, sample_size=1024):
+        """
+        Measure noise on a full-resolution crop from the middle of img_np.
+        Returns (sigma, impulse_fraction, ripple_fraction): sigma is a robust
+        estimate of the Gaussian noise level (median absolute response of a
+        Laplacian-type kernel, so sparse text edges do not count),
+        impulse_fraction the share of isolated salt-and-pepper pixels and
+        ripple_fraction the share of faint non-flat pixels, which is how JPEG
+        ringing around glyphs shows up in otherwise clean images.
+        """
+        h, w = img_np.shape[:2]
+        top = max(0, (h - sample_size) // 2)
+        left = max(0, (w - sample_size) // 2)
+        sample = img_np[top:top + sample_size, left:left + sample_size]
+        if sample.shape[0] < 3 or sample.shape[1] < 3:
+            return 0.0, 0.0, 0.0
+        # Immerkaer's kernel cancels smooth image structure; for Gaussian noise
+        # its response has standard deviation 6 * sigma
+        kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+        response = cv2.filter2D(sample.astype(np.float32), -1, kernel)[1:-1, 1:-1]
+        response = np.abs(response)
+        sigma = float(np.median(response)) / (0.6745 * 6)
+        ripple_fraction = float(np.count_nonzero((response > 0) & (response <= 12))) / response.size
+        # An impulse is brighter (or darker) than all of its 8 neighbours by a wide margin;
+        # glyph strokes always have neighbours of the same colour
+        ring = np.ones((3, 3), np.uint8)
+        ring[1, 1] = 0
+        neighbours_max = cv2.dilate(sample, ring)
+        neighbours_min = cv2.erode(sample, ring)
+        impulses = (sample.astype(np.int16) - neighbours_max > 64) | (neighbours_min.astype(np.int16) - sample > 64)
+        return sigma, float(np.count_nonzero(impulses)) / impulses.size, ripple_fraction
+
+    def choose_denoise(self, img_np, mode='auto', report=None):
+        """
+        Pick the cheapest filter that handles the measured noise of img_np.
+        mode 'auto' picks none (clean scans, screenshots, born-digital images),
+        a 3x3 median (salt-and-pepper), a bilateral filter (light noise or
+        compression ringing) or non-local means (heavy noise); 'nlmeans'
+        always uses non-local means and 'off' skips denoising.
+        Returns (method, sigma); report receives the measurements and method.
+        """
+        sigma, impulse_fraction, ripple_fraction = self.estimate_noise(img_np)
+        if mode == 'off':
+            method = 'none'
+        elif mode == 'nlmeans':
+            method = 'nlmeans'
+        elif impulse_fraction > 0.001:
+            method = 'median'
+        elif sigma < 3 and ripple_fraction < 0.03:
+            method = 'none'
+        elif sigma < 8:
+            method = 'bilateral'
+        else:
+            method = 'nlmeans'
+        if report is not None:
+            report['noise_sigma'] = round(sigma, 2)
+            report['impulse_fraction'] = round(impulse_fraction, 5)
+            report['ripple_fraction'] = round(ripple_fraction, 4)
+            report['denoise'] = method
+        return method, sigma
+
+    def denoise(self, img_np, method, sigma):
+        """Apply a method chosen by choose_denoise() with its noise estimate sigma."""
+        if method == 'median':
+            return cv2.medianBlur(img_np, 3)
+        if method == 'bilateral':
+            # Edge-preserving: flattens ringing and grain but not glyph edges
+            return cv2.bilateralFilter(img_np, 5, max(24.0, 3 * sigma), 5)
+        if method == 'nlmeans':
+            # Filter strength follows the noise; 10 was the previous fixed value
+            return cv2.fastNlMeansDenoising(img_np, None, float(min(25.0, max(10.0, sigma))), 7, 21)
+        return img_np
+
+    @staticmethod
+    def is_binary(img_np):
+        """True when img_np only contains pure black and pure white pixels."""
+        hist = cv2.calcHist([img_np], [0], None, [256], [0, 256])
+        return not hist[1:255].any()
+
+    def estimate_skew_angle(self, img_np, analysis_size=1000, max_angle=15.0, max_points=200000):
+        """
+        Skew of the text lines in img_np in degrees (positive when lines
+        descend to the right), or None without enough ink to tell.
+        Works on a copy downsampled to about analysis_size: ink pixels are sheared
+        by candidate angles and the angle whose row histogram (projection
+        profile) is sharpest wins, searched in 1 degree steps over
+        +/-max_angle and then refined to 0.1 degree. Cost does not depend on
+        the input size.
+        """
+        # An integer reduction factor keeps INTER_AREA on its fast path (~10 ms for 20 MP)
+        factor = -(-max(img_np.shape[:2]) // analysis_size)
+        small = cv2.resize(img_np, None, fx=1 / factor, fy=1 / factor, interpolation=cv2.INTER_AREA) if factor > 1 else img_np
+        _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        ys, xs = np.nonzero(ink)
+        if ys.size < 100 or ys.size > 0.5 * ink.size: # Blank, or Otsu picked the background as ink
+            return None
+        if ys.size > max_points:
+            keep = np.random.default_rng(0).choice(ys.size, max_points, replace=False)
+            ys, xs = ys[keep], xs[keep]
+        ys = ys.astype(np.float32)
+        xs = xs.astype(np.float32) - small.shape[1] / 2 # Shear about the centre keeps rows in range
+        # Refinement searches up to 1 degree past max_angle; the offset must cover that shear too
+        offset = small.shape[1] * np.tan(np.deg2rad(max_angle + 1.0)) / 2 + 1
+
+        def sharpness(angle):
+            rows = (ys - xs * np.tan(np.deg2rad(angle)) + offset).astype(np.int32)
+            profile = np.bincount(rows)
+            return float(np.dot(profile, profile)) # Sum of squares: peaks when lines align with rows
+
+        coarse = max(np.arange(-max_angle, max_angle + 0.5, 1.0), key=sharpness)
+        return round(float(max(np.arange(coarse - 1.0, coarse + 1.05, 0.1), key=sharpness)), 1) + 0.0 # No -0.0
+
+    def rotate(self, img_np, angle, interpolation='linear'):
+        """
+        Rotate a uint8 image by angle degrees (positive turns the content
+        counter-clockwise, undoing a positive estimate_skew_angle()) about its centre,
+        keeping its size. Edges are filled by replicating the border so no
+        dark wedges appear in the corners. interpolation is a key of
+        ROTATION_INTERPOLATION. The result is a new array: a rotation cannot
+        be done in place.
+        """
+        h, w = img_np.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        return cv2.warpAffine(img_np, matrix, (w, h),
+                              flags=ROTATION_INTERPOLATION[interpolation],
+                              borderMode=cv2.BORDER_REPLICATE)
+
+    def process_image_for_ocr(self, img_pil, enable_deskew=False, enable_adaptive_threshold=False,
+                              target_text_height=None, denoise='auto', deskew_interpolation='linear',
+                              report=None):
+        """
+        Applies a series of preprocessing steps to a PIL image (or NumPy
+        array, which is then processed in place) for improved OCR and returns
+        the result as a grayscale NumPy array. With target_text_height the image is rescaled to that character
+        height; denoise is passed to choose_denoise() and deskew_interpolation
+        to rotate(). report (a dict) receives the measured height, the scale
+        used, the denoising decision, the skew angle and per-stage timings.
+        """
+        # One grayscale buffer for the whole pipeline; stages overwrite it where OpenCV allows
+        img_np = as_gray_array(img_pil)
+
+        # Shrinking happens first and enlarging after denoising, so the expensive
+        # steps always run on the smaller image and see the original noise
+        stages = []
+        if target_text_height:
+            stages.append(ShrinkStage(self, target_text_height))
+        stages.append(ContrastStage(self))
+        stages.append(DenoiseStage(self, denoise))
+        if target_text_height:
+            stages.append(EnlargeStage(self))
+        if enable_deskew:
+            stages.append(DeskewStage(self, deskew_interpolation))
+        stages.append(ThresholdStage(self, enable_adaptive_threshold))
+        return PreprocessPipeline(stages).run(img_np, report)
+
+class PreprocessStage:
+    """
+    One step of the preprocessing pipeline. analyze() inspects the image
+    first and returns a reason when the step would be a no-op (the image is
+    already binary, already straight, not noisy...), otherwise None and
+    apply() runs. Both may record measurements in state['report'] and pass
+    values to later stages through state.
+    """
+    name = "stage"
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def analyze(self, img_np, state):
+        return None
+
+    def apply(self, img_np, state):
+        raise NotImplementedError
+
+class ShrinkStage(PreprocessStage):
+    """Downscale oversized text to the target character height."""
+    name = "shrink"
+
+    def __init__(self, processor, target_text_height):
+        super().__init__(processor)
+        self.target_text_height = target_text_height
+
+    def analyze(self, img_np, state):
+        state['scale'] = self.processor.normalization_scale(img_np, self.target_text_height, state['report'])
+        if state['scale'] > 1.0:
+            return "enlarged after denoising"
+        if state['scale'] == 1.0:
+            return "text height on target" if state['report'].get('text_height') else "no measurable text"
+        return None
+
+    def apply(self, img_np, state):
+        return self.processor.rescale(img_np, state['scale'])
+
+class ContrastStage(PreprocessStage):
+    """Stretch the grey levels to the full 0-255 range."""
+    name = "contrast"
+
+    def analyze(self, img_np, state):
+        low, high, _, _ = cv2.minMaxLoc(img_np)
+        if low == 0 and high == 255:
+            return "full range"
+        if low == high:
+            return "blank image"
+        return None
+
+    def apply(self, img_np, state):
+        return cv2.normalize(img_np, inplace_dst(img_np), 0, 255, cv2.NORM_MINMAX)
+
+class DenoiseStage(PreprocessStage):
+    """Remove noise with the filter choose_denoise() picks for this image."""
+    name = "denoise"
+
+    def __init__(self, processor, mode='auto'):
+        super().__init__(processor)
+        self.mode = mode
+
+    def analyze(self, img_np, state):
+        state['denoise'] = self.processor.choose_denoise(img_np, self.mode, state['report'])
+        if state['denoise'][0] == 'none':
+            return "disabled" if self.mode == 'off' else "no noise"
+        return None
+
+    def apply(self, img_np, state):
+        return self.processor.denoise(img_np, *state['denoise'])
+
+class EnlargeStage(PreprocessStage):
+    """Upscale small text to the target height (scale measured by ShrinkStage)."""
+    name = "enlarge"
+
+    def analyze(self, img_np, state):
+        if state.get('scale', 1.0) <= 1.0:
+            return "no enlargement needed"
+        return None
+
+    def apply(self, img_np, state):
+        return self.processor.rescale(img_np, state['scale'])
+
+class DeskewStage(PreprocessStage):
+    """Rotate the text lines level, with the angle from estimate_skew_angle()."""
+    name = "deskew"
+
+    def __init__(self, processor, interpolation='linear', min_angle=0.25):
+        super().__init__(processor)
+        self.interpolation = interpolation
+        self.min_angle = min_angle
+
+    def analyze(self, img_np, state):
+        try:
+            angle = self.processor.estimate_skew_angle(img_np)
+        except Exception as e:
+            print(f"Deskewing failed: {e}") # Log error, but don't stop processing
+            return "failed"
+        state['report']['skew_angle'] = angle
+        if angle is None:
+            return "no measurable text lines"
+        # Smaller angles are within the estimate's resolution and do not hurt Tesseract
+        if abs(angle) <= self.min_angle:
+            return "already straight"
+        return None
+
+    def apply(self, img_np, state):
+        return self.processor.rotate(img_np, state['report']['skew_angle'], self.interpolation)
+
+class ThresholdStage(PreprocessStage):
+    """Binarize with adaptive Gaussian thresholding or Otsu."""
+    name = "threshold"
+
+    def __init__(self, processor, adaptive=False):
+        super().__init__(processor)
+        self.adaptive = adaptive
+
+    def analyze(self, img_np, state):
+        if self.processor.is_binary(img_np):
+            return "already binary"
+        return None
+
+    def apply(self, img_np, state):
+        if self.adaptive:
+            # The rule of cv2.adaptiveThreshold(GAUSSIAN_C, block 11, C=2): white where the
+            # pixel is above its local mean - 2. Spelled out so the only extra buffer is
+            # the uint8 mean; adaptiveThreshold allocates ~4 bytes per pixel internally
+            # (and rounds its mean slightly differently, so edge pixels may differ).
+            mean = cv2.GaussianBlur(img_np, (11, 11), 0, borderType=cv2.BORDER_REPLICATE | cv2.BORDER_ISOLATED)
+            cv2.subtract(mean, 1, dst=mean) # pixel > mean - 2 <=> pixel >= mean - 1; saturating at 0 keeps it exact
+            return cv2.compare(img_np, mean, cv2.CMP_GE, dst=inplace_dst(img_np))
+        _, img_np = cv2.threshold(img_np, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=inplace_dst(img_np))
+        return img_np
+
+class PreprocessPipeline:
+    """Runs PreprocessStages in order and records what each one did and cost."""
+
+    def __init__(self, stages):
+        self.stages = stages
+
+    def run(self, img_np, report=None):
+        """
+        Run every stage over img_np and return the result. report (a dict)
+        receives the stages' measurements and a 'stages' list of
+        {'stage', 'ms', 'skipped'} entries, skipped being the no-op reason.
+        """
+        state = {'report': report if report is not None else {}}
+        timings = []
+        for stage in self.stages:
+            start = time.perf_counter()
+            skipped = stage.analyze(img_np, state)
+            if skipped is None:
+                img_np = stage.apply(img_np, state)
+            timings.append({'stage': stage.name, 'ms': round((time.perf_counter() - start) * 1000, 1), 'skipped': skipped})
+        state['report']['stages'] = timings
+        return img_np
+
+    @staticmethod
+    def describe(report):
+        """One-line summary of report['stages'], e.g. 'shrink 12 ms, denoise skipped (no noise) 3 ms'."""
+        parts = []
+        for timing in report.get('stages', []):
+            skipped = f" skipped ({timing['skipped']})" if timing['skipped'] else ""
+            parts.append(f"{timing['stage']}{skipped} {timing['ms']:.0f} ms")
+        return ", ".join(parts)
+
+class OCRWord:
+    """A single recognised word with its bounding box and layout position."""
+
+    def __init__(self, text, left, top, width, height, conf,
+                 block_num=0, par_num=0, line_num=0, word_num=0, page_num=1):
+        self.text = text
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.conf = conf
+        self.block_num = block_num
+        self.par_num = par_num
+        self.line_num = line_num
+        self.word_num = word_num
+        self.page_num = page_num
+
+    @property
+    def box(self):
+        """Bounding box as (left, top, right, bottom)."""
+        return (self.left, self.top, self.left + self.width, self.top + self.height)
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+class OCRResult:
+    """
+    Result of a single Tesseract pass: the recognised words with their boxes,
+    layout numbers and confidences. The plain text is rebuilt from the words,
+    so one image_to_data call is enough for both the text and the confidence.
+    """
+
+    def __init__(self, words=None, lang=None, detected_language=None):
+        self.words = words if words is not None else []
+        self.lang = lang # Language the OCR pass ran with
+        self.detected_language = detected_language # Auto-detect outcome, if it ran
+        self.rotation = 0 # Clockwise degrees the image was turned by the OSD pre-stage
+        self.script = None # Script reported by OSD, if it ran
+        self.speculation = None # 'kept'/'restarted' when speculative OCR ran
+        self.preprocess_report = {} # What preprocessing measured/decided (see ImageProcessor)
+        self.from_cache = False # Set when the result was served by OCRResultCache
+
+    @classmethod
+    def from_data(cls, data):
+        """Build a result from a pytesseract image_to_data Output.DICT."""
+        words = []
+        for i, text in enumerate(data['text']):
+            # Only word-level rows (level 5) carry text; the others are page/block/para/line boxes
+            if int(data['level'][i]) != 5 or not str(text).strip():
+                continue
+            words.append(OCRWord(
+                text=str(text).strip(),
+                left=int(data['left'][i]),
+                top=int(data['top'][i]),
+                width=int(data['width'][i]),
+                height=int(data['height'][i]),
+                conf=float(data['conf'][i]),
+                block_num=int(data['block_num'][i]),
+                par_num=int(data['par_num'][i]),
+                line_num=int(data['line_num'][i]),
+                word_num=int(data['word_num'][i]),
+                page_num=int(data['page_num'][i]),
+            ))
+        return cls(words)
+
+    @property
+    def confidences(self):
+        return [w.conf for w in self.words if w.conf != -1]
+
+    @property
+    def average_confidence(self):
+        confidences = self.confidences
+        return sum(confidences) / len(confidences) if confidences else 0
+
+    def rescale(self, factor):
+        """Scale all word boxes by factor (e.g. back to the source resolution)."""
+        if factor == 1.0:
+            return
+        for w in self.words:
+            w.left = int(round(w.left * factor))
+            w.top = int(round(w.top * factor))
+            w.width = int(round(w.width * factor))
+            w.height = int(round(w.height * factor))
+
+    def lines(self):
+        """Group words into lines, in Tesseract's reading order."""
+        lines = []
+        current_key = None
+        for word in self.words:
+            key = (word.page_num, word.block_num, word.par_num, word.line_num)
+            if key != current_key:
+                lines.append((key, []))
+                current_key = key
+            lines[-1][1].append(word)
+        return lines
+
+    @property
+    def text(self):
+        """
+        Plain text rebuilt the way image_to_string lays it out: words joined by
+        spaces, lines by newlines, and a blank line between paragraphs/blocks.
+        """
+        out = []
+        previous_para = None
+        for (page_num, block_num, par_num, _), words in self.lines():
+            para = (page_num, block_num, par_num)
+            if previous_para is not None and para != previous_para:
+                out.append("")
+            out.append(" ".join(w.text for w in words))
+            previous_para = para
+        return "\n".join(out) + "\n" if out else ""
+
+    def to_dict(self):
+        return {
+            'lang': self.lang,
+            'detected_language': self.detected_language,
+            'rotation': self.rotation,
+            'script': self.script,
+            'speculation': self.speculation,
+            'preprocess_report': self.preprocess_report,
+            'words': [w.to_dict() for w in self.words],
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        result = cls([OCRWord.from_dict(w) for w in d['words']], d.get('lang'), d.get('detected_language'))
+        result.rotation = d.get('rotation', 0)
+        result.script = d.get('script')
+        result.speculation = d.get('speculation')
+        result.preprocess_report = d.get('preprocess_report', {})
+        return result
+
+    @classmethod
+    def from_tsv(cls, tsv):
+        """Build a result from Tesseract's TSV output (with or without the header row)."""
+        columns = ['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+                   'left', 'top', 'width', 'height', 'conf', 'text']
+        data = {c: [] for c in columns}
+        for line in tsv.splitlines():
+            if not line or line.startswith('level'):
+                continue
+            parts = line.split('\t')
+            parts += [''] * (len(columns) - len(parts)) # Non-word rows have an empty text column
+            for column, value in zip(columns, parts):
+                data[column].append(value)
+        return cls.from_data(data)
+
+class OCRBackend:
+    """
+    Interface for the engine that turns an image into an OCRResult.
+    Images are PIL images or 8-bit NumPy arrays (grayscale or RGB);
+    lang=None means "Tesseract's default language".
+    """
+    name = None
+    description = None
+
+    def image_to_data(self, img, lang, psm, oem):
+        raise NotImplementedError
+
+    def image_to_string(self, img, lang, psm, oem):
+        return self.image_to_data(img, lang, psm, oem).text
+
+    def detect_orientation(self, img):
+        """
+        Orientation and script detection (Tesseract OSD, PSM 0). Returns a dict
+        with 'rotate' (clockwise degrees that make the page upright),
+        'orientation_conf', 'script' and 'script_conf'.
+        """
+        raise NotImplementedError
+
+    def get_languages(self):
+        """Language packs this backend's Tesseract can load ('osd' included when installed)."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any engine resources held by the backend."""
+        pass
+
+def encode_netpbm(img):
+    """
+    Uncompressed Netpbm bytes for a PIL image or NumPy array: 1-bit PBM for
+    black-and-white images, PGM for grayscale, PPM for colour. Costs a
+    header and a memory copy, where PNG costs a deflate pass on each side.
+    """
+    if not isinstance(img, np.ndarray):
+        if 'A' in img.getbands():
+            # Flatten transparency onto white, as pytesseract does
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, (0, 0), img.getchannel('A'))
+            img = background
+        elif img.mode not in ('L', 'RGB'):
+            img = img.convert('L' if img.mode == '1' else 'RGB')
+        img = np.asarray(img)
+    height, width = img.shape[:2]
+    if img.ndim == 3:
+        if img.shape[2] == 4:
+            img = cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
+        return f"P6\n{width} {height}\n255\n".encode('ascii') + np.ascontiguousarray(img).tobytes()
+    if ImageProcessor.is_binary(img):
+        # PBM: 1 = black, each row padded to whole bytes
+        return f"P4\n{width} {height}\n".encode('ascii') + np.packbits(img < 128, axis=1).tobytes()
+    return f"P5\n{width} {height}\n255\n".encode('ascii') + np.ascontiguousarray(img).tobytes()
+
+class TesseractSubprocessBackend(OCRBackend):
+    """
+    Runs the tesseract executable, one process per call. The image is piped
+    to its stdin as Netpbm and the result read from stdout, so there is no
+    PNG encode/decode and no temp file. The executable is
+    pytesseract.pytesseract.tesseract_cmd.
+    """
+    name = "subprocess"
+    description = "Tesseract executable"
+
+    def run(self, img, args):
+        """Run 'tesseract stdin stdout <args>' on img and return its output."""
+        import pytesseract # Only for tesseract_cmd (set by the GUI or the caller) and its exception types
+        cmd = [pytesseract.pytesseract.tesseract_cmd, 'stdin', 'stdout'] + args
+        kwargs = {}
+        if platform.system() == "Windows":
+            kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW # No console flashing up per call
+        try:
+            proc = subprocess.run(cmd, input=encode_netpbm(img), capture_output=True, **kwargs)
+        except FileNotFoundError:
+            raise pytesseract.TesseractNotFoundError()
+        if proc.returncode:
+            raise pytesseract.TesseractError(proc.returncode, proc.stderr.decode('utf-8', 'replace').strip())
+        return proc.stdout.decode('utf-8')
+
+    def image_to_data(self, img, lang, psm, oem):
+        args = ['--oem', str(oem), '--psm', str(psm)]
+        if lang:
+            args += ['-l', lang]
+        return OCRResult.from_tsv(self.run(img, args + ['tsv']))
+
+    def detect_orientation(self, img):
+        # PSM 0 prints "Rotate: 90", "Orientation confidence: 5.1", "Script: Latin", ...
+        fields = {}
+        for line in self.run(img, ['--psm', '0']).splitlines():
+            key, sep, value = line.partition(': ')
+            if sep:
+                fields[key.strip()] = value.strip()
+        try:
+            return {
+                'rotate': int(fields['Rotate']),
+                'orientation_conf': float(fields['Orientation confidence']),
+                'script': fields['Script'],
+                'script_conf': float(fields['Script confidence']),
+            }
+        except (KeyError, ValueError):
+            raise RuntimeError("Orientation detection failed (too few characters?)")
+
+    def get_languages(self):
+        import pytesseract
+        return list(pytesseract.get_languages(config=''))
+
+class TesserocrBackend(OCRBackend):
+    """
+    Runs Tesseract in-process through tesserocr. Each language/OEM model is
+    loaded once and reused for every following image, so there is no process
+    spawn, temp file or traineddata reload per call. Tesseract API handles
+    are not thread-safe, so each thread keeps its own set.
+    """
+    name = "inprocess"
+    description = "In-process Tesseract (tesserocr)"
+
+    def __init__(self, tessdata_path=None):
+        try:
+            import tesserocr
+        except ImportError:
+            raise ImportError("The in-process backend requires 'tesserocr'. Install with: pip install tesserocr")
+        self.tesserocr = tesserocr
+        self.tessdata_path = tessdata_path or os.environ.get('TESSDATA_PREFIX')
+        self._local = threading.local()
+        self._all_apis = []
+        self._lock = threading.Lock()
+
+    def _get_api(self, lang, oem):
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+        key = (lang or 'eng', int(oem))
+        api = apis.get(key)
+        if api is None:
+            kwargs = {'lang': key[0], 'oem': key[1]}
+            if self.tessdata_path:
+                kwargs['path'] = self.tessdata_path
+            api = self.tesserocr.PyTessBaseAPI(**kwargs)
+            apis[key] = api
+            with self._lock:
+                self._all_apis.append(api)
+        return api
+
+    def _set_image(self, api, img):
+        """
+        Hand pixels to Tesseract as raw bytes; SetImage() would encode a PIL
+        image to BMP and have Leptonica decode it again.
+        """
+        if not isinstance(img, np.ndarray):
+            if img.mode not in ('L', 'RGB', 'RGBA'):
+                img = img.convert('RGB')
+            img = np.asarray(img)
+        img = np.ascontiguousarray(img) # Views such as np.rot90() output are strided
+        height, width = img.shape[:2]
+        bytes_per_pixel = 1 if img.ndim == 2 else img.shape[2]
+        api.SetImageBytes(img.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+
+    def image_to_data(self, img, lang, psm, oem):
+        api = self._get_api(lang, oem)
+        api.SetPageSegMode(int(psm))
+        self._set_image(api, img)
+        try:
+            tsv = api.GetTSVText(0)
+        finally:
+            api.Clear() # Drop the image and recognition results, keep the loaded model
+        return OCRResult.from_tsv(tsv)
+
+    def detect_orientation(self, img):
+        api = self._get_api('osd', 3)
+        api.SetPageSegMode(0) # PSM 0: OSD only
+        self._set_image(api, img)
+        try:
+            osd = api.DetectOrientationScript()
+        finally:
+            api.Clear()
+        if not osd:
+            raise RuntimeError("Orientation detection failed (too few characters?)")
+        return {
+            # tesserocr reports the page's orientation; turning it back is the opposite rotation
+            'rotate': (360 - int(osd['orient_deg'])) % 360,
+            'orientation_conf': float(osd['orient_conf']),
+            'script': osd['script_name'],
+            'script_conf': float(osd['script_conf']),
+        }
+
+    def get_languages(self):
+        # tesserocr wants the tessdata directory with a trailing separator
+        args = (os.path.join(self.tessdata_path, ''),) if self.tessdata_path else ()
+        _, languages = self.tesserocr.get_languages(*args)
+        return list(languages)
+
+    def close(self):
+        with self._lock:
+            for api in self._all_apis:
+                api.End()
+            self._all_apis = []
+        self._local = threading.local()
+
+# Available OCR backends, selectable per run
+OCR_BACKENDS = {
+    TesseractSubprocessBackend.name: TesseractSubprocessBackend,
+    TesserocrBackend.name: TesserocrBackend,
+}
+
+def create_ocr_backend(name):
+    """Instantiate an OCR backend by name (see OCR_BACKENDS)."""
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend '{name}'. Choose one of: {', '.join(OCR_BACKENDS)}")
+    return OCR_BACKENDS[name]()
+
+# What gets OCR'd in a PDF
+PDF_MODES = {
+    'images': "Embedded images",
+    'render': "Render whole pages", # Scans split into strips, vector-outlined text
+    'hybrid': "Embedded images the text layer misses", # Born-digital and already-OCR'd scans
+}
+
+class OCROptions:
+    """
+    Snapshot of the effective OCR settings for one run. Kept as a plain,
+    picklable object so it can be handed to PDF worker processes.
+    """
+
+    def __init__(self, lang='eng', psm='3', oem='3', backend=TesseractSubprocessBackend.name,
+                 auto_detect_lang=True, enable_preprocessing=True, enable_deskew=True,
+                 enable_adaptive_threshold=True, pdf_workers=0, use_cache=True,
+                 cache_dir=None, cache_max_mb=512, enable_osd=False, osd_min_confidence=5.0,
+                 speculative_ocr=True, enable_tiling=True, tile_size=4096, tile_overlap=256,
+                 tile_min_megapixels=40, normalize_resolution=True, target_text_height=28,
+                 denoise='auto', deskew_interpolation='linear', pdf_mode='images',
+                 render_dpi=300, render_grayscale=True, min_image_size=32, resume_jobs=True,
+                 pdf_image_dpi=300):
+        self.lang = lang
+        self.psm = psm
+        self.oem = oem
+        self.backend = backend
+        self.auto_detect_lang = auto_detect_lang
+        self.enable_preprocessing = enable_preprocessing
+        self.enable_deskew = enable_deskew
+        self.enable_adaptive_threshold = enable_adaptive_threshold
+        self.pdf_workers = pdf_workers # 0 = let plan_threads() choose
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir # None = default_cache_dir()
+        self.cache_max_mb = cache_max_mb
+        self.enable_osd = enable_osd # Auto-rotate and pick the model family from the script
+        self.osd_min_confidence = osd_min_confidence
+        self.speculative_ocr = speculative_ocr # Overlap auto-detect with an OCR pass in options.lang
+        self.enable_tiling = enable_tiling # OCR very large images as overlapping tiles
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap # Must exceed the widest word for seam de-duplication
+        self.tile_min_megapixels = tile_min_megapixels
+        self.normalize_resolution = normalize_resolution # Rescale to target_text_height before OCR
+        self.target_text_height = target_text_height # Typical character height in pixels
+        self.denoise = denoise # 'auto' (by measured noise), 'nlmeans' or 'off'
+        self.deskew_interpolation = deskew_interpolation # Key of ROTATION_INTERPOLATION
+        self.pdf_mode = pdf_mode # Key of PDF_MODES
+        self.render_dpi = render_dpi # Resolution for pdf_mode 'render'
+        self.render_grayscale = render_grayscale # Render pages in grayscale (1 byte per pixel)
+        self.min_image_size = min_image_size # Embedded images with a shorter side below this (px) are not OCR'd
+        self.resume_jobs = resume_jobs # Journal finished PDF pages and skip them when a job is restarted
+        self.pdf_image_dpi = pdf_image_dpi # Embedded JPEGs at twice this or more are decoded at reduced size
+
+    def cache_signature(self, lang):
+        """
+        Everything that changes the OCR output for a given image, as a string.
+        lang is the language the result is requested in ("auto:<lang>" when
+        auto-detection decides it).
+        """
+        return "|".join([
+            f"lang={lang}",
+            f"psm={self.psm}",
+            f"oem={self.oem}",
+            f"preprocess={self.enable_preprocessing}",
+            f"deskew={self.enable_deskew}:{self.deskew_interpolation}",
+            f"adaptive_threshold={self.enable_adaptive_threshold}",
+            f"normalize={self.normalize_resolution}:{self.target_text_height}",
+            f"denoise={self.denoise}",
+            f"osd={self.enable_osd}:{self.osd_min_confidence}",
+            f"tiling={self.enable_tiling}:{self.tile_size}:{self.tile_overlap}:{self.tile_min_megapixels}",
+        ])
+
+def default_cache_dir():
+    """Root directory for on-disk caches (override with OCR_GUI_CACHE_DIR)."""
+    return os.environ.get('OCR_GUI_CACHE_DIR') or str(Path.home() / '.cache' / 'ocr_gui')
+
+class OCRResultCache:
+    """
+    Content-addressed on-disk cache of OCRResults. The key is a hash of the
+    source image pixels plus the effective OCR configuration, so re-running
+    the same file or re-pasting the same screenshot skips preprocessing and
+    OCR entirely. Entries are small JSON files; a hit bumps the file's mtime
+    and once the cache exceeds max_bytes the least recently used entries
+    are evicted down to low_water of it, so a full cache is not rescanned
+    on every write. Writes are atomic, so several worker processes can
+    share one directory.
+    """
+
+    subdir = 'results'
+
+    def __init__(self, cache_dir=None, max_bytes=512 * 1024 * 1024, low_water=0.9):
+        self.cache_dir = os.path.join(cache_dir or default_cache_dir(), self.subdir)
+        self.max_bytes = max_bytes
+        self.low_water = low_water # Fraction of max_bytes that eviction trims down to
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None # Computed lazily from the directory
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(img, signature):
+        """
+        Hash of the image's mode, size and pixel data plus the config
+        signature. A NumPy array hashes like the PIL image with the same pixels.
+        """
+        h = hashlib.sha256()
+        if isinstance(img, np.ndarray):
+            mode = 'L' if img.ndim == 2 else {3: 'RGB', 4: 'RGBA'}[img.shape[2]]
+            h.update(f"{mode}|{image_size(img)}|{signature}".encode('utf-8'))
+            h.update(np.ascontiguousarray(img)) # Hashed in place, no bytes copy
+        else:
+            h.update(f"{img.mode}|{img.size}|{signature}".encode('utf-8'))
+            h.update(img.tobytes())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = self.decode(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path) # Mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def contains(self, key):
+        """Whether key is cached; marks the entry as recently used, so it survives eviction a while longer."""
+        try:
+            os.utime(self._path(key))
+            return True
+        except OSError:
+            return False
+
+    def decode(self, d):
+        result = OCRResult.from_dict(d)
+        result.from_cache = True
+        return result
+
+    def encode(self, result):
+        return result.to_dict()
+
+    def put(self, key, result):
+        data = json.dumps(self.encode(result)).encode('utf-8')
+        try:
+            replaced = os.path.getsize(self._path(key)) # Overwriting an entry does not add to the total
+        except OSError:
+            replaced = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        if self._total_bytes is not None:
+            self._total_bytes += len(data) - replaced
+        if self.total_bytes() > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def total_bytes(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        return self._total_bytes
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in low_water x max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.low_water
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            'dir': self.cache_dir,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+class PDFPageCache(OCRResultCache):
+    """
+    Finished PDF page results keyed by the page's content fingerprint (see
+    pdf_page_fingerprint) plus the OCR configuration, independent of the
+    document the page is in. A re-issued document with a few pages changed
+    only has those pages OCR'd again.
+    """
+
+    subdir = 'pages'
+
+    @staticmethod
+    def make_key(fingerprint, signature):
+        return hashlib.sha256(f"{fingerprint}|{signature}".encode('utf-8')).hexdigest()
+
+    def decode(self, d):
+        page_result = page_result_from_dict(d)
+        page_result['unchanged'] = True
+        page_result['cache_hits'] = page_result['cache_misses'] = 0 # Not this run's lookups
+        return page_result
+
+    def encode(self, page_result):
+        d = page_result_to_dict(page_result)
+        # Stored on its own, a repeated image is no longer "the one on page N"
+        d['images'] = [{k: v for k, v in entry.items() if k != 'reused_from'} for entry in d['images']]
+        d.pop('resumed', None)
+        return d
+
+# Tesseract's OpenMP parallelism stops paying off beyond a handful of threads per image
+MAX_TESSERACT_THREADS = 4
+
+class ThreadPlan:
+    """
+    How the CPU budget is split for one job: outer worker processes, OpenMP
+    threads inside each Tesseract call, and OpenCV's thread pool size.
+    """
+
+    def __init__(self, workers, omp_threads, cv2_threads, cpu_count):
+        self.workers = workers
+        self.omp_threads = omp_threads
+        self.cv2_threads = cv2_threads
+        self.cpu_count = cpu_count
+
+    def apply(self):
+        """
+        Apply the per-process limits. OMP_THREAD_LIMIT is inherited by tesseract
+        subprocesses; an in-process engine only reads it when its process first
+        loads Tesseract, which is why PDF workers apply the plan in their initializer.
+        """
+        os.environ['OMP_THREAD_LIMIT'] = str(self.omp_threads)
+        cv2.setNumThreads(self.cv2_threads)
+
+    def describe(self):
+        return (f"{self.workers} worker(s) x {self.omp_threads} Tesseract thread(s), "
+                f"{self.cv2_threads} OpenCV thread(s) per worker, on {self.cpu_count} CPU(s)")
+
+def plan_threads(job_units, requested_workers=0, cpu_count=None):
+    """
+    Split the CPUs between outer workers and the engines' inner thread pools
+    so that workers x threads never exceeds the core count.
+
+    job_units is the number of independent pieces of work (PDF pages, tiles, 1
+    for a single image). requested_workers=0 picks the worker count
+    automatically: one worker per unit up to the CPU count. A lone unit runs
+    in-process and gets the inner threads instead.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    job_units = max(1, int(job_units))
+    workers = int(requested_workers) if requested_workers else cpu_count
+    workers = max(1, min(workers, job_units, cpu_count))
+    threads_per_worker = max(1, cpu_count // workers)
+    return ThreadPlan(
+        workers=workers,
+        omp_threads=min(threads_per_worker, MAX_TESSERACT_THREADS),
+        cv2_threads=threads_per_worker,
+        cpu_count=cpu_count,
+    )
+
+def langdetect_detect(text):
+    """langdetect.detect, imported on first use (loading its profiles is slow) and seeded for consistent results."""
+    from langdetect import detect, DetectorFactory
+    DetectorFactory.seed = 0
+    return detect(text)
+
+# langdetect reports ISO 639-1 codes; Tesseract language packs are named by ISO 639-2
+LANGDETECT_TO_TESSERACT = {
+    'ar': 'ara', 'bg': 'bul', 'ca': 'cat', 'cs': 'ces', 'da': 'dan', 'de': 'deu',
+    'el': 'ell', 'en': 'eng', 'es': 'spa', 'et': 'est', 'fa': 'fas', 'fi': 'fin',
+    'fr': 'fra', 'he': 'heb', 'hi': 'hin', 'hr': 'hrv', 'hu': 'hun', 'id': 'ind',
+    'it': 'ita', 'ja': 'jpn', 'ko': 'kor', 'lt': 'lit', 'lv': 'lav', 'nl': 'nld',
+    'no': 'nor', 'pl': 'pol', 'pt': 'por', 'ro': 'ron', 'ru': 'rus', 'sk': 'slk',
+    'sl': 'slv', 'sv': 'swe', 'th': 'tha', 'tr': 'tur', 'uk': 'ukr', 'vi': 'vie',
+    'zh-cn': 'chi_sim', 'zh-tw': 'chi_tra',
+}
+
+class LanguageDetector:
+    """
+    Cheap language detection for auto-detect. Rather than OCRing the whole
+    page as if it were one text line, it OCRs a handful of sampled text lines
+    at reduced resolution in a single call, or reads the PDF text layer when
+    there is one. Outcomes are cached per document.
+    """
+
+    def __init__(self, engine, max_samples=6, sample_line_height=40, sample_line_width=480,
+                 analysis_size=1000, min_text_chars=40, max_cached=256):
+        self.engine = engine
+        self.max_samples = max_samples # Text lines OCR'd for detection
+        self.sample_line_height = sample_line_height # Sampled lines are scaled down to this height
+        self.sample_line_width = sample_line_width # ...and cut to this width: a few words are enough
+        self.analysis_size = analysis_size # Longest side of the copy used to find text lines
+        self.min_text_chars = min_text_chars # Text layers shorter than this fall back to sampling
+        self.max_cached = max_cached # Documents remembered; least recently used are dropped first
+        # doc_key -> raw langdetect code, or None when no text was found. Sampling OCRs in
+        # Tesseract's default language, so the code does not depend on the selected one.
+        self.cache = OrderedDict()
+
+    def resolve(self, code, options):
+        """
+        Map a langdetect code to (label, lang_for_ocr) given the installed
+        packs. Falls back to options.lang when there is no code, no mapping
+        for it, or the installed packs are unknown.
+        """
+        if code is None:
+            return "None (no text detected for auto-detection)", options.lang
+        lang = LANGDETECT_TO_TESSERACT.get(code)
+        if lang is None:
+            return f"{code} (no Tesseract language for this code)", options.lang
+        available = self.engine.installed_languages(options)
+        if not available:
+            return f"{lang} (installed Tesseract packs unknown)", options.lang
+        if lang not in available:
+            return f"{lang} (Tesseract pack not installed)", options.lang
+        return lang, lang
+
+    def code_from_text(self, text):
+        """Raw langdetect code for text, or None when it is empty."""
+        text = text.strip()
+        return langdetect_detect(text) if text else None
+
+    def detect_from_text(self, text, options):
+        return self.resolve(self.code_from_text(text), options)
+
+    def sample_text_lines(self, img):
+        """
+        Find the most prominent text lines on a downsampled copy and return
+        them cropped from the full image, each reduced to sample_line_height.
+        """
+        gray = as_gray_array(img)
+        h, w = gray.shape
+        scale = min(1.0, self.analysis_size / max(h, w))
+        small = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+
+        # Ink -> white, then smear characters horizontally into line blobs
+        _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        ink = cv2.dilate(ink, cv2.getStructuringElement(cv2.MORPH_RECT, (25, 3)))
+        contours, _ = cv2.findContours(ink, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        small_h = small.shape[0]
+        boxes = []
+        for contour in contours:
+            x, y, bw, bh = cv2.boundingRect(contour)
+            # Keep line-shaped blobs: wider than tall, not specks, not whole-page regions
+            if bh >= 4 and bh <= max(8, small_h // 8) and bw >= 3 * bh:
+                boxes.append((bw * bh, x, y, bw, bh))
+        boxes = sorted(boxes, reverse=True)[:self.max_samples]
+        boxes.sort(key=lambda b: b[2]) # Back to top-to-bottom reading order
+
+        lines = []
+        for _, x, y, bw, bh in boxes:
+            pad = 2
+            x0 = max(0, int((x - pad) / scale))
+            y0 = max(0, int((y - pad) / scale))
+            x1 = min(w, int((x + bw + pad) / scale))
+            y1 = min(h, int((y + bh + pad) / scale))
+            line = gray[y0:y1, x0:x1]
+            if line.shape[0] > self.sample_line_height:
+                factor = self.sample_line_height / line.shape[0]
+                line = cv2.resize(line, (max(1, int(line.shape[1] * factor)), self.sample_line_height),
+                                  interpolation=cv2.INTER_AREA)
+            lines.append(line[:, :self.sample_line_width])
+        return lines
+
+    def code_from_image(self, img, options):
+        """Raw langdetect code for lines sampled off img, or None when none are found."""
+        lines = self.sample_text_lines(img)
+        if not lines:
+            return None
+
+        # Stack the sampled lines into one small strip so detection is a single OCR call
+        gap = 10
+        strip_w = max(line.shape[1] for line in lines) + 2 * gap
+        strip_h = sum(line.shape[0] + gap for line in lines) + gap
+        strip = np.full((strip_h, strip_w), 255, dtype=np.uint8)
+        y = gap
+        for line in lines:
+            strip[y:y + line.shape[0], gap:gap + line.shape[1]] = line
+            y += line.shape[0] + gap
+
+        # PSM 6: the strip is a uniform block of lines; default language for the sampling pass
+        text = self.engine.ocr_image(strip, options, None, psm=6).text
+        return self.code_from_text(text)
+
+    def detect_from_image(self, img, options):
+        return self.resolve(self.code_from_image(img, options), options)
+
+    def is_cached(self, doc_key):
+        return doc_key is not None and doc_key in self.cache
+
+    def detect(self, options, img=None, text=None, doc_key=None):
+        """
+        Returns (detected_language_label, lang_for_ocr). Uses text (e.g. a PDF
+        text layer) when it is long enough, else samples lines from img. Only
+        the raw code is cached; it is resolved against the current options on
+        every call.
+        """
+        if self.is_cached(doc_key):
+            self.cache.move_to_end(doc_key)
+            return self.resolve(self.cache[doc_key], options)
+        try:
+            if text is not None and len(text.strip()) >= self.min_text_chars:
+                code = self.code_from_text(text)
+            elif img is not None:
+                code = self.code_from_image(img, options)
+            else:
+                code = None
+        except Exception as e:
+            return f"Error: {e}", options.lang
+        if doc_key is not None:
+            self.cache[doc_key] = code
+            while len(self.cache) > self.max_cached:
+                self.cache.popitem(last=False)
+        return self.resolve(code, options)
+
+# Tesseract OSD script names -> language packs for that script, preferred first.
+# Latin is deliberately absent: the script alone does not pick a Latin language.
+SCRIPT_TO_TESSERACT = {
+    'Arabic': ['ara', 'fas', 'urd'],
+    'Armenian': ['hye'],
+    'Bengali': ['ben', 'asm'],
+    'Cyrillic': ['rus', 'ukr', 'bul', 'srp', 'bel', 'mkd'],
+    'Devanagari': ['hin', 'mar', 'nep', 'san'],
+    'Ethiopic': ['amh'],
+    'Georgian': ['kat'],
+    'Greek': ['ell', 'grc'],
+    'Gujarati': ['guj'],
+    'Gurmukhi': ['pan'],
+    'Han': ['chi_sim', 'chi_tra'],
+    'Hangul': ['kor'],
+    'Hebrew': ['heb'],
+    'Japanese': ['jpn'],
+    'Kannada': ['kan'],
+    'Khmer': ['khm'],
+    'Lao': ['lao'],
+    'Malayalam': ['mal'],
+    'Myanmar': ['mya'],
+    'Sinhala': ['sin'],
+    'Tamil': ['tam'],
+    'Telugu': ['tel'],
+    'Thai': ['tha'],
+    'Tibetan': ['bod'],
+}
+
+def rotate_right_angle(img, rotation):
+    """
+    Turn a PIL image or NumPy array clockwise by 90/180/270 degrees
+    (lossless; arrays come back as a view, without copying).
+    """
+    if rotation not in (90, 180, 270):
+        return img
+    if isinstance(img, np.ndarray):
+        return np.rot90(img, -rotation // 90) # rot90 turns counter-clockwise
+    # transpose() turns counter-clockwise
+    transposes = {90: Image.ROTATE_270, 180: Image.ROTATE_180, 270: Image.ROTATE_90}
+    return img.transpose(transposes[rotation])
+
+class ImageTiler:
+    """
+    OCR for very large images (A0 drawings, 600 dpi posters). The image is
+    cut into overlapping tiles that are preprocessed and OCR'd in parallel,
+    so working memory stays bounded by the tile size instead of the page.
+
+    Each tile owns a "core" rectangle: the tile minus half the overlap on
+    every side it shares with a neighbour. The cores partition the image, so
+    keeping only the words whose centre falls in their tile's core drops the
+    copies seen twice in an overlap band. Any remaining near-identical boxes
+    (same text, IoU > 0.5) are merged as well.
+    """
+
+    def __init__(self, tile_size=4096, overlap=256):
+        self.tile_size = tile_size
+        self.overlap = overlap
+
+    @staticmethod
+    def should_tile(img, options):
+        width, height = image_size(img)
+        return options.enable_tiling and width * height > options.tile_min_megapixels * 1_000_000
+
+    def tile_boxes(self, width, height):
+        """Yield (box, core) per tile, both as (left, top, right, bottom)."""
+        step = max(1, self.tile_size - self.overlap)
+        half = self.overlap // 2
+        xs = list(range(0, max(1, width - self.overlap), step))
+        ys = list(range(0, max(1, height - self.overlap), step))
+        for y0 in ys:
+            for x0 in xs:
+                x1 = min(width, x0 + self.tile_size)
+                y1 = min(height, y0 + self.tile_size)
+                core = (
+                    x0 + half if x0 > 0 else 0,
+                    y0 + half if y0 > 0 else 0,
+                    x1 - half if x1 < width else width,
+                    y1 - half if y1 < height else height,
+                )
+                yield (x0, y0, x1, y1), core
+
+    def overview(self, img, max_side=4096):
+        """
+        Downscaled version of the whole image for the cheap whole-page stages
+        (skew, OSD, language). Only the small image is allocated.
+        """
+        width, height = image_size(img)
+        factor = -(-max(width, height) // max_side) # Integer reduction: box filter, no full-size copy
+        if factor <= 1:
+            return img
+        if isinstance(img, np.ndarray):
+            return cv2.resize(img, None, fx=1 / factor, fy=1 / factor, interpolation=cv2.INTER_AREA)
+        return img.reduce(factor)
+
+    @staticmethod
+    def page_transform(width, height, skew_angle, rotation):
+        """
+        3x3 matrix taking source pixels to the straightened page (turned by
+        -skew_angle about the centre like ImageProcessor.rotate, then by the
+        OSD rotation like rotate_right_angle) and that page's (width, height).
+        """
+        matrix = np.vstack([cv2.getRotationMatrix2D((width / 2, height / 2), skew_angle or 0.0, 1.0), [0, 0, 1]])
+        turns = {
+            90: ([[0, -1, height - 1], [1, 0, 0]], (height, width)),
+            180: ([[-1, 0, width - 1], [0, -1, height - 1]], (width, height)),
+            270: ([[0, 1, 0], [-1, 0, width - 1]], (height, width)),
+        }
+        if rotation in turns:
+            turn, (width, height) = turns[rotation]
+            matrix = np.vstack([turn, [0, 0, 1]]) @ matrix
+        return matrix, width, height
+
+    @staticmethod
+    def cut_tile(img, box, matrix, interpolation):
+        """
+        Pixels of box on the page that matrix maps img onto, read from just the
+        source region the box covers, so no straightened copy of the whole
+        image is made.
+        """
+        x0, y0, x1, y1 = box
+        inverse = np.linalg.inv(matrix)
+        corners = inverse @ np.array([[x0, x1, x0, x1], [y0, y0, y1, y1], [1, 1, 1, 1]], dtype=np.float64)
+        width, height = image_size(img)
+        pad = 2 # Interpolation reads a pixel or two beyond the exact corners
+        sx0 = int(max(0, np.floor(corners[0].min()) - pad))
+        sy0 = int(max(0, np.floor(corners[1].min()) - pad))
+        sx1 = int(min(width, np.ceil(corners[0].max()) + pad + 1))
+        sy1 = int(min(height, np.ceil(corners[1].max()) + pad + 1))
+        region = img[sy0:sy1, sx0:sx1] if isinstance(img, np.ndarray) else img.crop((sx0, sy0, sx1, sy1))
+        # Page -> tile is a shift by (-x0, -y0); region -> source a shift by (sx0, sy0)
+        to_tile = np.array([[1, 0, -x0], [0, 1, -y0], [0, 0, 1]], dtype=np.float64)
+        from_region = np.array([[1, 0, sx0], [0, 1, sy0], [0, 0, 1]], dtype=np.float64)
+        tile_matrix = (to_tile @ matrix @ from_region)[:2]
+        return cv2.warpAffine(as_gray_array(region), tile_matrix, (x1 - x0, y1 - y0),
+                              flags=ROTATION_INTERPOLATION[interpolation], borderMode=cv2.BORDER_REPLICATE)
+
+    def recognize(self, engine, img, options, lang, skew_angle=None, rotation=0):
+        """
+        OCR img tile by tile. Tiles are never deskewed on their own: each
+        would turn about its own centre and its word boxes would no longer
+        map back onto the page. Instead skew_angle (measured once on the
+        overview) and the OSD rotation define one straightened page, in the
+        order the overview went through them, and each tile is cut from it
+        straight out of the source, so memory stays bounded by the tile size.
+        """
+        matrix = None
+        width, height = image_size(img)
+        if skew_angle or rotation in (90, 180, 270):
+            matrix, width, height = self.page_transform(width, height, skew_angle, rotation)
+        tiles = list(self.tile_boxes(width, height))
+        # Tiles are independent units of work; the inner pools get what is left per worker
+        plan = plan_threads(len(tiles), cpu_count=engine.cpu_budget)
+        plan.apply()
+
+        def ocr_tile(tile):
+            box, _ = tile
+            report = {}
+            x0, y0, x1, y1 = box
+            if matrix is not None:
+                tile_img = self.cut_tile(img, box, matrix, options.deskew_interpolation)
+            else:
+                tile_img = img[y0:y1, x0:x1] if isinstance(img, np.ndarray) else img.crop(box)
+            processed = engine.prepare_image(tile_img, options, report, deskew=False)
+            tile_result = engine.ocr_image(processed, options, lang)
+            tile_result.rescale(1 / report.get('scale', 1.0))
+            return tile_result
+
+        # Tesseract and OpenCV release the GIL, so threads are enough and the source image is shared
+        with ThreadPoolExecutor(max_workers=plan.workers, thread_name_prefix="ocr-tile") as pool:
+            tile_results = list(pool.map(ocr_tile, tiles))
+
+        words = []
+        for tile_index, ((box, core), tile_result) in enumerate(zip(tiles, tile_results)):
+            x0, y0 = box[0], box[1]
+            for word in tile_result.words:
+                cx = x0 + word.left + word.width / 2
+                cy = y0 + word.top + word.height / 2
+                if not (core[0] <= cx < core[2] and core[1] <= cy < core[3]):
+                    continue # This word belongs to a neighbouring tile
+                word.left += x0
+                word.top += y0
+                # Keep blocks from different tiles apart when the text is rebuilt
+                word.block_num += (tile_index + 1) * 1000
+                words.append(word)
+        return OCRResult(self.dedupe(words))
+
+    @staticmethod
+    def dedupe(words, min_iou=0.5):
+        """Drop lower-confidence duplicates: same text with heavily overlapping boxes."""
+        def iou(a, b):
+            ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+            iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+            inter = ix * iy
+            union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+            return inter / union if union > 0 else 0
+
+        by_text = {}
+        for word in words:
+            by_text.setdefault(word.text, []).append(word)
+        dropped = set()
+        for same_text in by_text.values():
+            for i, a in enumerate(same_text):
+                for b in same_text[i + 1:]:
+                    if id(a) in dropped or id(b) in dropped:
+                        continue
+                    if iou(a.box, b.box) > min_iou:
+                        dropped.add(id(b) if a.conf >= b.conf else id(a))
+        return [w for w in words if id(w) not in dropped]
+
+def pdf_document_key(pdf_path):
+    """Cheap identity for a PDF file: path, size and modification time."""
+    st = os.stat(pdf_path)
+    return f"{os.path.abspath(pdf_path)}|{st.st_size}|{st.st_mtime_ns}"
+
+class OCREngine:
+    """Preprocessing + OCR for images and PDF pages, independent of the GUI."""
+
+    def __init__(self, image_processor=None):
+        self.image_processor = image_processor or ImageProcessor()
+        self.backends = {}
+        self.cache = None
+        self.page_cache = None # Lazily created PDFPageCache
+        self.language_detector = LanguageDetector(self)
+        self._speculation_pool = None
+        # CPUs this engine may use for inner parallelism (tiles); None = all of them.
+        # PDF workers set this to their share of the thread plan.
+        self.cpu_budget = None
+        # Installed Tesseract languages set by the caller; None asks the backend (see installed_languages)
+        self.available_languages = None
+        self._backend_languages = {} # backend name -> languages it reported
+
+    def installed_languages(self, options):
+        """
+        Installed Tesseract languages as the selected backend sees them;
+        detected languages outside this list are not used. Asked of the
+        backend the first time ('osd' is kept, it marks the orientation model
+        as installed) and empty when it cannot tell. available_languages,
+        when set, takes precedence.
+        """
+        if self.available_languages is not None:
+            return self.available_languages
+        if options.backend not in self._backend_languages:
+            try:
+                languages = self.get_backend(options.backend).get_languages()
+            except Exception:
+                languages = []
+            self._backend_languages[options.backend] = languages
+        return self._backend_languages[options.backend]
+
+    def get_cache(self, options):
+        """Return the result cache if caching is enabled for this run."""
+        if not options.use_cache:
+            return None
+        if self.cache is None:
+            self.cache = OCRResultCache(options.cache_dir, int(options.cache_max_mb) * 1024 * 1024)
+        return self.cache
+
+    def get_page_cache(self, options):
+        """Return the PDF page cache if caching is enabled for this run."""
+        if not options.use_cache:
+            return None
+        if self.page_cache is None:
+            self.page_cache = PDFPageCache(options.cache_dir, int(options.cache_max_mb) * 1024 * 1024)
+        return self.page_cache
+
+    def get_backend(self, name):
+        """Return the named backend, creating it on first use."""
+        if name not in self.backends:
+            self.backends[name] = create_ocr_backend(name)
+        return self.backends[name]
+
+    def prepare_image(self, img, options, report=None, deskew=True):
+        """
+        Apply preprocessing if enabled (returning a grayscale NumPy array),
+        otherwise just make the image Tesseract-friendly. report (a dict)
+        collects what preprocessing did, including the 'scale' OCR boxes must
+        be divided by. deskew=False skips deskewing even when it is enabled.
+        """
+        if isinstance(img, np.ndarray):
+            if not options.enable_preprocessing:
+                return img # Backends take 8-bit grayscale/RGB(A) arrays as they are
+            if img.flags.writeable:
+                # The caller's pixels (or a tile's neighbours) are not ours to overwrite
+                img = img.view()
+                img.flags.writeable = False
+        if options.enable_preprocessing:
+            return self.image_processor.process_image_for_ocr(
+                img,
+                enable_deskew=options.enable_deskew and deskew,
+                enable_adaptive_threshold=options.enable_adaptive_threshold,
+                target_text_height=options.target_text_height if options.normalize_resolution else None,
+                denoise=options.denoise,
+                deskew_interpolation=options.deskew_interpolation,
+                report=report
+            )
+        # Tesseract generally likes 1-bit (binary), 8-bit (grayscale), or 24-bit (RGB)
+        if img.mode not in ['1', 'L', 'RGB']:
+            return img.convert('RGB')
+        return img
+
+    def ocr_image(self, img, options, lang, psm=None):
+        """Run one OCR pass with the configured backend and return the OCRResult."""
+        backend = self.get_backend(options.backend)
+        return backend.image_to_data(img, lang, psm if psm is not None else options.psm, options.oem)
+
+    def detect_orientation_script(self, processed_img, options):
+        """
+        OSD pre-stage: returns (upright_img, rotation, script). The image is
+        turned by 90/180/270 degrees when OSD is confident about it.
+        """
+        try:
+            osd = self.get_backend(options.backend).detect_orientation(processed_img)
+        except Exception:
+            # Too little text, or no osd.traineddata: carry on unrotated
+            return processed_img, 0, None
+
+        rotation = 0
+        if osd['rotate'] in (90, 180, 270) and osd['orientation_conf'] >= options.osd_min_confidence:
+            rotation = osd['rotate']
+            processed_img = rotate_right_angle(processed_img, rotation)
+        script = osd['script'] if osd['script_conf'] >= options.osd_min_confidence else None
+        return processed_img, rotation, script
+
+    def lang_for_script(self, script, lang, options):
+        """
+        Pick a traineddata family for the detected script. Keeps lang when it
+        already covers the script, or when the script does not narrow it down.
+        """
+        candidates = SCRIPT_TO_TESSERACT.get(script)
+        if not candidates or any(part in candidates for part in lang.split('+')):
+            return lang
+        available = self.installed_languages(options)
+        for candidate in candidates:
+            if candidate in available:
+                return candidate
+        if f"script/{script}" in available:
+            return f"script/{script}"
+        return lang
+
+    def detect_language(self, processed_img, options, doc_key=None):
+        """
+        Guess the language of an already preprocessed image from a few sampled
+        text lines. Returns (detected_language_label, lang_for_ocr).
+        """
+        return self.language_detector.detect(options, img=processed_img, doc_key=doc_key)
+
+    def detect_pdf_language(self, doc, pdf_path, options, max_pages=3):
+        """
+        Detect the language of a PDF once per document: from the text layer of
+        the first pages when there is one, otherwise from lines sampled off a
+        grayscale render of the first page.
+        """
+        doc_key = pdf_document_key(pdf_path)
+        if self.language_detector.is_cached(doc_key):
+            return self.language_detector.detect(options, doc_key=doc_key)
+        if len(doc) == 0:
+            return "N/A", options.lang
+
+        text_layer = "".join(doc[i].get_text() for i in range(min(max_pages, len(doc))))
+        if len(text_layer.strip()) >= self.language_detector.min_text_chars:
+            return self.language_detector.detect(options, text=text_layer, doc_key=doc_key)
+
+        import fitz  # PyMuPDF
+        pix = doc[0].get_pixmap(dpi=150, colorspace=fitz.csGRAY)
+        page_img = self.prepare_image(pixmap_to_array(pix), options)
+        return self.language_detector.detect(options, img=page_img, doc_key=doc_key)
+
+    def get_speculation_pool(self):
+        if self._speculation_pool is None:
+            self._speculation_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-speculative")
+        return self._speculation_pool
+
+    def detect_and_recognize_speculatively(self, processed_img, options, doc_key):
+        """
+        Start the main OCR pass in the selected language on a background
+        thread while language detection runs. If detection agrees the
+        speculative result is kept; otherwise it is dropped and the pass is
+        re-run in the detected language. A pass that has not started yet is
+        cancelled; one already inside Tesseract runs to completion and is
+        discarded.
+        Returns (result, detected_language_label, lang).
+        """
+        speculative = self.get_speculation_pool().submit(self.ocr_image, processed_img, options, options.lang)
+        detected_language, lang = self.detect_language(processed_img, options, doc_key)
+        if lang == options.lang:
+            result = speculative.result()
+            result.speculation = "kept"
+        else:
+            speculative.cancel()
+            result = self.ocr_image(processed_img, options, lang)
+            result.speculation = "restarted"
+        return result, detected_language, lang
+
+    def recognize(self, img, options, lang=None):
+        """
+        Full pipeline for one source image: result cache -> preprocessing ->
+        (language detection) -> OCR. With lang=None the language comes from
+        auto-detection if enabled, otherwise from options.lang.
+        """
+        if lang is not None:
+            lang_key = lang
+        elif options.auto_detect_lang:
+            lang_key = f"auto:{options.lang}"
+        else:
+            lang_key = options.lang
+
+        cache = self.get_cache(options)
+        key = None
+        if cache is not None:
+            key = cache.make_key(img, options.cache_signature(lang_key))
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        # Create the backend here, on the calling thread: the speculative and tile
+        # pools use it from worker threads, and tesserocr can only be imported
+        # on the main thread (it installs signal handlers)
+        self.get_backend(options.backend)
+        tiled = ImageTiler.should_tile(img, options)
+        report = {}
+        skew_angle = None
+        if tiled:
+            # OSD, language detection and the skew measurement look at a downscaled overview; OCR runs per tile
+            overview_report = {}
+            processed_img = self.prepare_image(ImageTiler().overview(img), options, overview_report)
+            if any(stage['stage'] == 'deskew' and stage['skipped'] is None for stage in overview_report.get('stages', [])):
+                skew_angle = overview_report['skew_angle']
+        else:
+            processed_img = self.prepare_image(img, options, report)
+        rotation, script = 0, None
+        if options.enable_osd:
+            processed_img, rotation, script = self.detect_orientation_script(processed_img, options)
+
+        result = None
+        detected_language = "N/A"
+        script_lang = self.lang_for_script(script, lang or options.lang, options) if script else None
+        if script_lang is not None and script_lang != (lang or options.lang):
+            # The script rules out the selected model family; no need to sample for a language
+            detected_language = f"{script_lang} (from {script} script)"
+            lang = script_lang
+        elif lang is None:
+            if options.auto_detect_lang:
+                # Identical images (e.g. a re-pasted screenshot) share one detection
+                doc_key = key or OCRResultCache.make_key(img, "language")
+                if options.speculative_ocr and not tiled and not self.language_detector.is_cached(doc_key):
+                    result, detected_language, lang = self.detect_and_recognize_speculatively(
+                        processed_img, options, doc_key)
+                else:
+                    detected_language, lang = self.detect_language(processed_img, options, doc_key)
+            else:
+                lang = options.lang
+
+        if result is None and tiled:
+            tiler = ImageTiler(options.tile_size, options.tile_overlap)
+            result = tiler.recognize(self, img, options, lang, skew_angle, rotation)
+        elif result is None:
+            result = self.ocr_image(processed_img, options, lang)
+        if not tiled:
+            # Boxes back in source-image pixels (tiles are mapped back individually)
+            result.rescale(1 / report.get('scale', 1.0))
+        result.preprocess_report = report
+        result.lang = lang
+        result.detected_language = detected_language
+        result.rotation = rotation
+        result.script = script
+        if cache is not None:
+            cache.put(key, result)
+        return result
+
+    def cache_counters(self):
+        """(hits, misses) so far, for aggregating worker statistics."""
+        if self.cache is None:
+            return 0, 0
+        return self.cache.hits, self.cache.misses
+
+    def render_pdf_page(self, page, options):
+        """Rasterize a whole page at options.render_dpi as a NumPy array (grayscale unless render_grayscale is off)."""
+        import fitz  # PyMuPDF
+        colorspace = fitz.csGRAY if options.render_grayscale else fitz.csRGB
+        pix = page.get_pixmap(dpi=options.render_dpi, colorspace=colorspace, alpha=False)
+        return pixmap_to_array(pix)
+
+    def extract_pdf_page(self, doc, page_num, options, memo=None):
+        """
+        All the MuPDF work for one page: the text layer plus either the
+        embedded images or a full-page render, decoded to arrays. This is the
+        only step that touches doc; ocr_extracted_page() does the OCR. With a
+        PDFImageMemo, images already seen on an earlier page are not decoded
+        again, and images smaller than options.min_image_size are skipped.
+        """
+        page = doc[page_num]
+        if memo is not None:
+            memo.start_page()
+        extracted = {
+            'page_num': page_num,
+            'regular_text': page.get_text(),
+            'images': [],
+            'page_image': None,
+            'page_error': None,
+        }
+        if options.pdf_mode == 'render':
+            try:
+                extracted['page_image'] = self.render_pdf_page(page, options)
+            except Exception as e:
+                extracted['page_error'] = str(e)
+            return extracted
+
+        words = page.get_text("words") if options.pdf_mode == 'hybrid' else None
+        for img_index, img in enumerate(page.get_images()):
+            image = {'index': img_index, 'array': None, 'error': None, 'skipped': None}
+            extracted['images'].append(image)
+            if min(img[2], img[3]) < options.min_image_size:
+                image['skipped'] = f"{img[2]}x{img[3]} px, below the {options.min_image_size} px minimum"
+                image['small'] = True
+                continue
+            try:
+                digest = memo.digest(doc, img) if memo is not None else None
+                placements = pdf_image_placements(page, img) if words else None
+                # The text layer makes every occurrence different in hybrid mode, so only
+                # occurrences with no words over them share a result
+                shareable = not (words and self._has_words_over(placements, words))
+                if shareable and memo is not None and memo.repeat(digest):
+                    image['duplicate'] = digest
+                    continue
+                image['array'] = self.decode_pdf_image(doc, page, img, options, placements)
+                if not shareable:
+                    self._mask_text_layer(placements, image, words)
+                elif digest is not None:
+                    memo.add(digest, page_num)
+                    image['digest'] = digest
+            except Exception as e:
+                image['error'] = str(e)
+        if words is not None:
+            extracted['coverage'] = self._page_coverage(page, words)
+        return extracted
+
+    def decode_pdf_image(self, doc, page, img, options, placements=None):
+        """
+        Decode a page.get_images() entry to a NumPy array. Plain JPEGs are
+        decoded from their raw stream straight to grayscale, at reduced size
+        when they are far above options.pdf_image_dpi on the page; everything
+        else goes through MuPDF. placements (see pdf_image_placements) are
+        looked up if not given.
+        """
+        import fitz  # PyMuPDF
+        xref = img[0]
+        # A soft mask, colour-key mask or Decode array changes the pixels MuPDF would produce
+        if img[8] == 'DCTDecode' and not img[1] and all(
+                doc.xref_get_key(xref, key)[0] == 'null' for key in ('Decode', 'Mask')):
+            try:
+                if placements is None:
+                    placements = pdf_image_placements(page, img)
+                img_np = decode_jpeg_gray(doc.xref_stream_raw(xref), self._jpeg_decode_size(img, placements, options))
+            except Exception:
+                img_np = None # Let MuPDF have a go at a JPEG that PIL rejects
+            if img_np is not None:
+                return img_np
+        # MuPDF decodes the stream (JBIG2, Flate, CMYK JPEG...) once; the array reads its samples directly
+        return pixmap_to_array(fitz.Pixmap(doc, xref))
+
+    @staticmethod
+    def _jpeg_decode_size(img, placements, options):
+        """
+        Reduced (width, height) to decode an embedded JPEG at, or None for full
+        size. Only images at twice options.pdf_image_dpi or more, at their
+        largest placement on the page, are reduced.
+        """
+        width, height = img[2], img[3]
+        dpi = None
+        for _, transform in placements:
+            shown_width = (transform.a ** 2 + transform.b ** 2) ** 0.5 / 72 # Inches along the image's x axis
+            if shown_width > 0:
+                placement_dpi = width / shown_width
+                dpi = placement_dpi if dpi is None else min(dpi, placement_dpi)
+        if dpi is None or dpi < 2 * options.pdf_image_dpi:
+            return None
+        scale = options.pdf_image_dpi / dpi
+        return (max(1, int(np.ceil(width * scale))), max(1, int(np.ceil(height * scale))))
+
+    @staticmethod
+    def _has_words_over(placements, words):
+        """Whether any text-layer word overlaps a placement of the image."""
+        import fitz  # PyMuPDF
+        return any(rect.intersects(fitz.Rect(w[:4])) for rect, _ in placements for w in words)
+
+    @staticmethod
+    def _mask_text_layer(placements, image, words):
+        """
+        Hybrid mode: skip the image when the text layer already covers its ink,
+        or blank out the covered parts so only the rest is OCR'd.
+        """
+        coverage, covered = text_layer_coverage(image['array'], placements, words)
+        if coverage >= TEXT_LAYER_COVERED:
+            image['array'] = None
+            image['skipped'] = f"text layer covers {coverage:.0%} of it"
+        elif coverage >= TEXT_LAYER_PARTIAL:
+            masked = image['array'].copy()
+            masked[covered] = 255
+            image['array'] = masked
+            image['partial'] = coverage
+
+    @staticmethod
+    def _page_coverage(page, words):
+        """Shares of the page area under text-layer words and under images."""
+        import fitz  # PyMuPDF
+        page_area = abs(page.rect) or 1
+        text_area = sum(abs(fitz.Rect(w[:4]) & page.rect) for w in words)
+        image_area = sum(abs(fitz.Rect(info['bbox']) & page.rect) for info in page.get_image_info())
+        return {'text': min(1.0, text_area / page_area), 'images': min(1.0, image_area / page_area)}
+
+    def ocr_extracted_page(self, extracted, options, lang, memo=None):
+        """
+        OCR what extract_pdf_page() produced, reusing memo results for images
+        repeated from earlier pages. Returns a picklable page-result dict (see
+        format_pdf_page).
+        """
+        hits_before, misses_before = self.cache_counters()
+        page_result = {
+            'page_num': extracted['page_num'],
+            'regular_text': extracted['regular_text'],
+            'images': [],
+            'page_ocr': None,
+            'coverage': extracted.get('coverage'),
+        }
+
+        if options.pdf_mode == 'render':
+            page_entry = {'dpi': options.render_dpi, 'result': None, 'error': extracted['page_error']}
+            if page_entry['error'] is None:
+                try:
+                    page_entry['result'] = self.recognize(extracted['page_image'], options, lang)
+                except Exception as e:
+                    page_entry['error'] = str(e)
+            page_result['page_ocr'] = page_entry
+
+        for image in extracted['images']:
+            image_entry = {'index': image['index'], 'result': None, 'error': image['error'],
+                           'skipped': image.get('skipped'), 'partial': image.get('partial'),
+                           'small': image.get('small', False)}
+            if 'duplicate' in image:
+                image_entry['result'], image_entry['error'] = memo.results[image['duplicate']]
+                image_entry['reused_from'] = memo.first_page[image['duplicate']]
+            elif image_entry['error'] is None and image_entry['skipped'] is None:
+                try:
+                    # Cached, or preprocessed and OCR'd in one engine call; text is rebuilt from the word data
+                    image_entry['result'] = self.recognize(image['array'], options, lang)
+                except Exception as e:
+                    image_entry['error'] = str(e)
+                if 'digest' in image:
+                    memo.results[image['digest']] = (image_entry['result'], image_entry['error'])
+            page_result['images'].append(image_entry)
+
+        hits_after, misses_after = self.cache_counters()
+        page_result['cache_hits'] = hits_after - hits_before
+        page_result['cache_misses'] = misses_after - misses_before
+        return page_result
+
+    def ocr_pdf_page(self, doc, page_num, options, lang, memo=None):
+        """
+        Extract the text layer and OCR the embedded images (or the rendered
+        page) of one PDF page. Returns a picklable page-result dict.
+        """
+        return self.ocr_extracted_page(self.extract_pdf_page(doc, page_num, options, memo), options, lang, memo)
+
+    def close(self):
+        if self._speculation_pool is not None:
+            self._speculation_pool.shutdown(wait=True)
+            self._speculation_pool = None
+        for backend in self.backends.values():
+            backend.close()
+        self.backends = {}
+
+class PDFImageMemo:
+    """
+    Per-document memo of embedded images. Logos, letterheads and stamps that
+    repeat on many pages (under one xref, or as identical copies under
+    several) are decoded and OCR'd once; later occurrences reuse the result.
+    Images are identified by a digest of their raw, still-encoded stream, so
+    a repeat is recognised before anything is decoded. Only repeats are kept
+    for the whole document: an image not seen again within keep_pages pages
+    is forgotten, so page scans do not pile up.
+    """
+
+    def __init__(self, keep_pages=2):
+        self.keep_pages = keep_pages # Must cover extraction running a page ahead of OCR
+        self._digests = {} # xref -> digest
+        self.first_page = {} # digest -> page number of the occurrence that is OCR'd
+        self.results = {} # digest -> (OCRResult or None, error or None)
+        self._pages = 0 # Pages started so far
+        self._seen_once = {} # digest -> self._pages when first seen, until the image repeats
+
+    def start_page(self):
+        """Count one more page and forget images seen once, more than keep_pages pages ago."""
+        self._pages += 1
+        for digest in [d for d, n in self._seen_once.items() if n < self._pages - self.keep_pages]:
+            del self._seen_once[digest]
+            del self.first_page[digest]
+            self.results.pop(digest, None)
+
+    def add(self, digest, page_num):
+        """Record the first occurrence of an image, whose result will be stored in results."""
+        self.first_page[digest] = page_num
+        self._seen_once[digest] = self._pages
+
+    def repeat(self, digest):
+        """Whether digest was seen before; if so it is kept for the rest of the document."""
+        if digest not in self.first_page:
+            return False
+        self._seen_once.pop(digest, None)
+        return True
+
+    def digest(self, doc, img):
+        """Digest of a page.get_images() entry: raw stream plus the attributes that decoding depends on."""
+        xref = img[0]
+        if xref not in self._digests:
+            h = hashlib.sha1()
+            h.update(repr(img[2:7] + img[8:9]).encode('utf-8')) # width, height, bpc, colorspaces, filter
+            h.update(doc.xref_stream_raw(xref) or b'')
+            self._digests[xref] = h.hexdigest()
+        return self._digests[xref]
+
+def format_pdf_page(page_result):
+    """Render a page-result dict into the text blocks shown in the results pane."""
+    page_label = page_result['page_num'] + 1
+    lines = []
+    regular_text = page_result['regular_text']
+    if regular_text.strip():
+        lines.append(f"\n=== Page {page_label} - Regular Text (Directly Extracted) ===")
+        lines.append(regular_text)
+
+    page_entry = page_result.get('page_ocr')
+    if page_entry is not None:
+        if page_entry['error'] is not None:
+            lines.append(f"\n=== Page {page_label} - Error during page OCR: {page_entry['error']} ===")
+        elif page_entry['result'].text.strip():
+            rotation = page_entry['result'].rotation
+            rotated = f", auto-rotated {rotation}°" if rotation else ""
+            lines.append(f"\n=== Page {page_label} - Rendered Page (OCR Results at {page_entry['dpi']} dpi{rotated}) ===")
+            lines.append(page_entry['result'].text)
+        else:
+            lines.append(f"\n=== Page {page_label} - Rendered Page (no text found after OCR) ===")
+
+    images = page_result['images']
+    if images:
+        coverage = page_result.get('coverage')
+        found = f"{len(images)} found"
+        if coverage is not None:
+            found += f"; words cover {coverage['text']:.0%} of the page, images {coverage['images']:.0%}"
+        lines.append(f"\n=== Page {page_label} - Embedded Images ({found}) ===")
+        for image_entry in images:
+            image_label = image_entry['index'] + 1
+            if image_entry['error'] is not None:
+                lines.append(f"\n--- Embedded Image {image_label} Error during OCR: {image_entry['error']} ---")
+            elif image_entry.get('reused_from') is not None:
+                lines.append(f"\n--- Embedded Image {image_label} (same image as on page {image_entry['reused_from'] + 1}, OCR result reused) ---")
+                lines.append(image_entry['result'].text)
+            elif image_entry.get('skipped'):
+                lines.append(f"\n--- Embedded Image {image_label} (OCR skipped: {image_entry['skipped']}) ---")
+            elif image_entry['result'].text.strip():
+                rotation = image_entry['result'].rotation
+                rotated = f", auto-rotated {rotation}°" if rotation else ""
+                partial = f", outside the {image_entry['partial']:.0%} the text layer covers" if image_entry.get('partial') else ""
+                lines.append(f"\n--- Embedded Image {image_label} (OCR Results{rotated}{partial}) ---")
+                lines.append(image_entry['result'].text)
+            else:
+                lines.append(f"\n--- Embedded Image {image_label} (no text found after OCR) ---")
+    return lines
+
+# Per-process state for parallel PDF OCR: every worker opens its own fitz document
+# handle and keeps its own engine (and therefore its own loaded OCR models).
+_pdf_worker_state = {}
+
+def _init_pdf_worker(pdf_path, options, lang, plan, tesseract_cmd, available_languages):
+    # Limit the inner thread pools before anything loads Tesseract or runs OpenCV
+    plan.apply()
+    import fitz  # PyMuPDF
+    import pytesseract
+    # Workers are spawned, not forked: nothing the parent configured is inherited
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    _pdf_worker_state['doc'] = fitz.open(pdf_path)
+    _pdf_worker_state['engine'] = OCREngine()
+    _pdf_worker_state['engine'].cpu_budget = plan.cv2_threads
+    _pdf_worker_state['engine'].available_languages = available_languages
+    _pdf_worker_state['options'] = options
+    _pdf_worker_state['lang'] = lang
+    _pdf_worker_state['memo'] = PDFImageMemo() # Repeats are found within each worker's share of the pages
+
+def _ocr_pdf_page_in_worker(page_num):
+    state = _pdf_worker_state
+    return state['engine'].ocr_pdf_page(state['doc'], page_num, state['options'], state['lang'], state['memo'])
+
+def pdf_worker_context():
+    """
+    Start method for PDF worker processes. Never fork: the caller (the Tk
+    GUI in particular) has threads running, and a forked child inherits
+    their locks in whatever state they were in.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+def ocr_pdf_pages(pdf_path, doc, options, lang, engine, plan=None, page_nums=None):
+    """
+    Yield page-result dicts in page order for page_nums (default: all pages).
+    When the thread plan has more than one worker the pages are extracted and
+    OCR'd by a pool of worker processes, otherwise in this process with
+    extraction one page ahead. Workers are kept at most two pages per worker
+    ahead of the consumer, so pages finished out of order cannot pile up.
+    page_nums may be a lazy iterable: it is advanced on the calling thread,
+    only as pages are dispatched, and never while doc is being read.
+    """
+    page_nums = range(len(doc)) if page_nums is None else page_nums
+    if plan is None:
+        page_nums = list(page_nums)
+        plan = plan_threads(len(page_nums), options.pdf_workers)
+    remaining = iter(page_nums)
+    if plan.workers == 1:
+        plan.apply()
+        page_num = next(remaining, None)
+        if page_num is None:
+            return
+        # Extract (decode images or render) the next page on a helper thread while this
+        # one is OCR'd. Only that thread touches doc, as PyMuPDF is not thread-safe.
+        memo = PDFImageMemo()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-extract") as extractor:
+            pending = extractor.submit(engine.extract_pdf_page, doc, page_num, options, memo)
+            while pending is not None:
+                extracted = pending.result()
+                page_num = next(remaining, None)
+                pending = None
+                if page_num is not None:
+                    pending = extractor.submit(engine.extract_pdf_page, doc, page_num, options, memo)
+                yield engine.ocr_extracted_page(extracted, options, lang, memo)
+        return
+
+    import pytesseract # Only for the tesseract_cmd the workers must use
+    initargs = (pdf_path, options, lang, plan, pytesseract.pytesseract.tesseract_cmd,
+                engine.installed_languages(options))
+    with ProcessPoolExecutor(max_workers=plan.workers, mp_context=pdf_worker_context(),
+                             initializer=_init_pdf_worker, initargs=initargs) as executor:
+        cache = engine.get_cache(options)
+        in_flight = deque() # Futures in page order
+
+        def submit_next():
+            page_num = next(remaining, None)
+            if page_num is not None:
+                in_flight.append(executor.submit(_ocr_pdf_page_in_worker, page_num))
+
+        try:
+            for _ in range(2 * plan.workers):
+                submit_next()
+            while in_flight:
+                page_result = in_flight.popleft().result()
+                submit_next()
+                if cache is not None:
+                    # Workers share the cache directory; fold their counters into ours
+                    cache.hits += page_result['cache_hits']
+                    cache.misses += page_result['cache_misses']
+                yield page_result
+        finally:
+            # A consumer that stops early only waits for the pages already running
+            for future in in_flight:
+                future.cancel()
+
+def pdf_page_fingerprint(doc, page, memo):
+    """
+    Hash of what a PDF page is made of: its size and rotation, its content
+    streams and form XObjects, the raw streams of its images (digested once
+    per document through memo, a PDFImageMemo), its fonts including their
+    embedded programs and ToUnicode maps, and its annotations with their
+    appearance streams. Only stream bytes are hashed, never object numbers,
+    so identical pages in different documents or versions of a document get
+    the same fingerprint.
+    """
+    h = hashlib.sha1()
+    h.update(f"{tuple(page.rect)}|{page.rotation}".encode('utf-8'))
+    h.update(page.read_contents())
+    for xobject in page.get_xobjects():
+        h.update(doc.xref_stream_raw(xobject[0]) or b'')
+    for img in page.get_images():
+        h.update(memo.digest(doc, img).encode('utf-8'))
+    for font in page.get_fonts():
+        h.update(repr(font[1:]).encode('utf-8')) # ext, type, basefont, name, encoding
+        # A composite font keeps its program on the descendant font
+        font_xrefs = [font[0]] + _pdf_refs(doc.xref_get_key(font[0], "DescendantFonts")[1])
+        for xref in font_xrefs:
+            for key in ("ToUnicode", "FontDescriptor/FontFile", "FontDescriptor/FontFile2", "FontDescriptor/FontFile3"):
+                for ref in _pdf_refs(doc.xref_get_key(xref, key)[1]):
+                    h.update(key.encode('utf-8'))
+                    h.update(doc.xref_stream_raw(ref) or b'')
+    for xref, annot_type, _ in page.annot_xrefs():
+        # Rendered pages include annotations, and form fields are annotations too
+        fields = [doc.xref_get_key(xref, key)[1] for key in ("Rect", "Contents", "V", "AS")]
+        h.update(repr((annot_type, fields)).encode('utf-8'))
+        for ref in _pdf_refs(doc.xref_get_key(xref, "AP/N")[1]): # One stream, or one per state
+            h.update(doc.xref_stream_raw(ref) or b'')
+    return h.hexdigest()
+
+def _pdf_refs(value):
+    """Object numbers of the indirect references ("12 0 R") in a PyMuPDF key value."""
+    return [int(num) for num in re.findall(r"(\d+) \d+ R", value)]
+
+def pdf_job_signature(options, lang):
+    """Everything that changes the page results of a PDF job, as a string."""
+    return "|".join([
+        options.cache_signature(lang),
+        f"pdf_mode={options.pdf_mode}:{options.render_dpi}:{options.render_grayscale}",
+        f"min_image_size={options.min_image_size}",
+        f"pdf_image_dpi={options.pdf_image_dpi}",
+    ])
+
+def page_result_to_dict(page_result):
+    """JSON-ready copy of a page-result dict (OCRResults become dicts)."""
+    d = dict(page_result)
+    d['images'] = [dict(entry, result=entry['result'].to_dict() if entry['result'] is not None else None)
+                   for entry in page_result['images']]
+    if page_result.get('page_ocr') is not None:
+        entry = page_result['page_ocr']
+        d['page_ocr'] = dict(entry, result=entry['result'].to_dict() if entry['result'] is not None else None)
+    return d
+
+def page_result_from_dict(d):
+    """Inverse of page_result_to_dict."""
+    page_result = dict(d)
+    page_result['images'] = [dict(entry, result=OCRResult.from_dict(entry['result']) if entry['result'] is not None else None)
+                             for entry in d['images']]
+    if d.get('page_ocr') is not None:
+        entry = d['page_ocr']
+        page_result['page_ocr'] = dict(entry, result=OCRResult.from_dict(entry['result']) if entry['result'] is not None else None)
+    return page_result
+
+class PDFJobJournal:
+    """
+    Append-only journal of the finished pages of one PDF job, so a run that
+    crashed or was closed part-way resumes where it stopped. Jobs are keyed
+    by a hash of the document bytes plus everything that changes the page
+    results; each finished page is one JSON line, flushed as it is written.
+    Only line offsets are kept in memory, and a torn last line from a crash
+    is ignored. The journal is removed once every page is done.
+    """
+
+    def __init__(self, pdf_path, options, lang, cache_dir=None):
+        self.jobs_dir = os.path.join(cache_dir or default_cache_dir(), 'jobs')
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        h = hashlib.sha256()
+        h.update(self.document_digest(pdf_path).encode('utf-8'))
+        h.update(pdf_job_signature(options, lang).encode('utf-8'))
+        self.path = os.path.join(self.jobs_dir, f"{h.hexdigest()}.jsonl")
+        self._offsets = {} # page number -> offset of its line
+        self._truncate_at = None # Set when the last line is a torn write
+        self._load()
+
+    @staticmethod
+    def document_digest(pdf_path, chunk_size=1024 * 1024):
+        h = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _load(self):
+        try:
+            f = open(self.path, 'rb')
+        except OSError:
+            return
+        with f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    self._truncate_at = offset # Torn write: overwritten by the next record()
+                    break
+                try:
+                    self._offsets[json.loads(line)['page_num']] = offset
+                except (ValueError, KeyError, TypeError):
+                    pass
+                offset += len(line)
+
+    def done_pages(self):
+        """Page numbers already in the journal."""
+        return set(self._offsets)
+
+    def load_page(self, page_num):
+        with open(self.path, 'rb') as f:
+            f.seek(self._offsets[page_num])
+            page_result = page_result_from_dict(json.loads(f.readline()))
+        page_result['resumed'] = True
+        return page_result
+
+    def record(self, page_result):
+        line = (json.dumps(page_result_to_dict(page_result)) + "\n").encode('utf-8')
+        with open(self.path, 'ab') as f:
+            if self._truncate_at is not None:
+                f.truncate(self._truncate_at)
+                self._truncate_at = None
+            offset = f.seek(0, os.SEEK_END)
+            f.write(line)
+        self._offsets[page_result['page_num']] = offset
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+class PDFRunStats:
+    """Running totals for one streamed PDF run, updated as each page arrives."""
+
+    def __init__(self):
+        self.page_count = 0
+        self.pages_done = 0
+        self.plan = None
+        self.total_confidence = 0
+        self.total_words = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.images_total = 0
+        self.images_skipped = 0 # Covered by the text layer (hybrid mode)
+        self.images_partial = 0
+        self.images_reused = 0
+        self.images_small = 0
+        self.pages_resumed = 0
+        self.pages_unchanged = 0
+
+    def add(self, page_result):
+        self.pages_done += 1
+        if page_result.get('resumed'):
+            self.pages_resumed += 1
+        elif page_result.get('unchanged'):
+            self.pages_unchanged += 1
+        self.cache_hits += page_result['cache_hits']
+        self.cache_misses += page_result['cache_misses']
+        images = page_result['images']
+        self.images_total += len(images)
+        self.images_skipped += sum(1 for entry in images if entry.get('skipped') and not entry.get('small'))
+        self.images_partial += sum(1 for entry in images if entry.get('partial'))
+        self.images_reused += sum(1 for entry in images if entry.get('reused_from') is not None)
+        self.images_small += sum(1 for entry in images if entry.get('small'))
+        entries = images + ([page_result['page_ocr']] if page_result['page_ocr'] else [])
+        for entry in entries:
+            ocr_result = entry['result']
+            if ocr_result is None or entry.get('reused_from') is not None:
+                continue # Repeated images count once
+            confidences = ocr_result.confidences
+            if confidences:
+                self.total_confidence += sum(confidences)
+                self.total_words += len(confidences)
+
+    @property
+    def average_confidence(self):
+        return self.total_confidence / self.total_words if self.total_words > 0 else 0
+
+    def summary_lines(self, options):
+        lines = [f"Overall OCR Confidence: {self.average_confidence:.2f}%"]
+        if self.pages_resumed:
+            lines.append(f"Resumed Pages: {self.pages_resumed} of {self.pages_done} restored from the job journal")
+        if self.pages_unchanged:
+            lines.append(f"Unchanged Pages: {self.pages_unchanged} of {self.pages_done} reused from earlier runs")
+        if options.use_cache:
+            lines.append(f"Result Cache: {self.cache_hits} hit(s), {self.cache_misses} miss(es)")
+        if options.pdf_mode != 'render':
+            lines.append(f"Embedded Images: {self.images_total} found, {self.images_reused} repeat(s) reused, "
+                         f"{self.images_small} below {options.min_image_size} px skipped")
+        if options.pdf_mode == 'hybrid':
+            lines.append(f"Text Layer: OCR skipped for {self.images_skipped} of {self.images_total} embedded image(s), "
+                         f"{self.images_partial} OCR'd only where uncovered")
+        return lines
+
+def stream_pdf_ocr(pdf_path, options, engine, stats=None, journal_only=False):
+    """
+    Generator over the text of a PDF OCR run: a header block, then one block
+    per page as soon as that page is done (in page order), then a summary
+    block. Each block ends with a newline, so the output is the blocks
+    concatenated. Nothing is kept between pages; pass a PDFRunStats to follow
+    progress and totals. With options.resume_jobs, finished pages are
+    journaled and a restarted run skips them; journal_only yields just the
+    pages an interrupted run finished, without OCRing the rest.
+    """
+    import fitz  # PyMuPDF
+
+    stats = stats if stats is not None else PDFRunStats()
+    doc = fitz.open(pdf_path)
+    try:
+        # Pick the outer worker count and inner thread limits for this document
+        plan = plan_threads(len(doc), options.pdf_workers)
+        plan.apply()
+        stats.plan = plan
+        stats.page_count = len(doc)
+
+        detected_language = "N/A"
+        actual_lang_for_ocr = options.lang
+        if options.auto_detect_lang and len(doc) > 0:
+            try:
+                # Text layer if present, else a few lines sampled from the first page; cached per document
+                detected_language, actual_lang_for_ocr = engine.detect_pdf_language(doc, pdf_path, options)
+            except Exception as e:
+                detected_language = f"Error: {e}"
+
+        journal = None
+        if options.resume_jobs or journal_only:
+            try:
+                journal = PDFJobJournal(pdf_path, options, actual_lang_for_ocr, options.cache_dir)
+            except OSError:
+                pass # Unwritable cache directory: run without a journal
+        done = journal.done_pages() if journal is not None else set()
+        todo = [] if journal_only else [n for n in range(len(doc)) if n not in done]
+
+        # Pages whose content fingerprint matches a page finished in an earlier run (of this
+        # or another version of the document) are spliced in from the page cache. Each page
+        # is looked up just before it is dispatched or yielded, whichever comes first.
+        page_cache = engine.get_page_cache(options) if todo else None
+        page_keys = {} # page_num -> page cache key, or None for an unreadable page structure
+        unchanged = set()
+        fingerprint_memo = PDFImageMemo()
+        signature = pdf_job_signature(options, actual_lang_for_ocr)
+
+        def is_unchanged(page_num):
+            if page_cache is None:
+                return False
+            if page_num not in page_keys:
+                page_keys[page_num] = None
+                try:
+                    fingerprint = pdf_page_fingerprint(doc, doc[page_num], fingerprint_memo)
+                except Exception:
+                    return False # Unreadable page structure: just OCR it
+                page_keys[page_num] = PDFPageCache.make_key(fingerprint, signature)
+                if page_cache.contains(page_keys[page_num]):
+                    unchanged.add(page_num)
+            return page_num in unchanged
+
+        def pages_to_ocr(first=0):
+            return (n for n in todo if n >= first and not is_unchanged(n))
+
+        if len(todo) < len(doc) and not journal_only:
+            # Re-plan for the pages that are actually left
+            plan = plan_threads(len(todo), options.pdf_workers)
+            plan.apply()
+            stats.plan = plan
+
+        header = [
+            "=== PDF OCR RESULTS ===",
+            f"File: {os.path.basename(pdf_path)}",
+            f"Pages: {len(doc)}",
+        ]
+        if done and not journal_only:
+            header.append(f"Resumed: {len(done)} page(s) restored from an interrupted run")
+        if journal_only:
+            header.append(f"Partial Results: {len(done)} of {len(doc)} page(s) finished so far")
+        header += [
+            f"Language (Selected): {options.lang}",
+            f"Language (Detected): {detected_language}",
+            f"Language (OCR Used): {actual_lang_for_ocr}",
+            f"PSM: {options.psm}",
+            f"OEM: {options.oem}",
+            f"OCR Backend: {options.backend}",
+            f"Thread Plan: {plan.describe()}",
+        ]
+        if options.pdf_mode == 'render':
+            header.append(f"PDF Mode: {PDF_MODES['render']} at {options.render_dpi} dpi ({'grayscale' if options.render_grayscale else 'colour'})")
+        else:
+            header.append(f"PDF Mode: {PDF_MODES[options.pdf_mode]}")
+        header.append(f"Preprocessing Enabled: {options.enable_preprocessing}")
+        if options.enable_preprocessing:
+            header.append(f"  - Deskewing: {options.enable_deskew}")
+            header.append(f"  - Adaptive Threshold: {options.enable_adaptive_threshold}")
+        header.append(f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        header.append("="*50)
+        yield "\n".join(header) + "\n"
+
+        # Pages come back in page order whether they ran serially or in the worker pool
+        fresh = ocr_pdf_pages(pdf_path, doc, options, actual_lang_for_ocr, engine, plan, pages_to_ocr())
+        for page_num in range(len(doc)):
+            if page_num in done:
+                page_result = journal.load_page(page_num)
+            elif journal_only:
+                continue
+            else:
+                page_result = page_cache.get(page_keys[page_num]) if is_unchanged(page_num) else None
+                if page_result is not None:
+                    page_result['page_num'] = page_num
+                else:
+                    if page_num in unchanged:
+                        # Evicted by another process since the check: OCR the page after all.
+                        # Only one stream may read doc at a time, so the fresh pages restart from it
+                        fresh.close()
+                        unchanged.discard(page_num)
+                        fresh = ocr_pdf_pages(pdf_path, doc, options, actual_lang_for_ocr, engine, plan,
+                                              pages_to_ocr(page_num))
+                    page_result = next(fresh)
+                    if journal is not None:
+                        journal.record(page_result)
+                    if page_keys.get(page_num) is not None:
+                        page_cache.put(page_keys[page_num], page_result)
+            stats.add(page_result)
+            yield "\n".join(format_pdf_page(page_result)) + "\n"
+        if journal is not None and not journal_only:
+            journal.remove() # Every page is done
+
+        yield "\n".join(["", "="*50, "=== SUMMARY ==="] + stats.summary_lines(options)) + "\n"
+    finally:
+        doc.close()
+
+# Exporters take an iterable of text blocks and write them as they arrive, so a
+# stream_pdf_ocr() run can go straight to disk. PDF and DOCX documents are
+# assembled by their libraries before saving.
+
+def write_txt(file_path, blocks):
+    """Export as plain text"""
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for block in blocks:
+            f.write(block)
+
+def write_pdf(file_path, blocks):
+    """Export as PDF using ReportLab with better text wrapping and encoding handling."""
+    try:
+        from reportlab.platypus import SimpleDocTemplate, Paragraph
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.pagesizes import letter
+        from xml.sax.saxutils import escape
+
+        doc = SimpleDocTemplate(file_path, pagesize=letter)
+        style = getSampleStyleSheet()["Normal"]
+        # One Paragraph per block: Paragraph markup needs escaping, newlines become <br/>
+        story = [Paragraph(escape(block).replace('\n', '<br/>\n'), style) for block in blocks]
+        doc.build(story)
+
+    except ImportError:
+        # Fallback to fpdf if reportlab not available
+        try:
+            from fpdf import FPDF
+        except ImportError:
+            raise ImportError("PDF export requires 'reportlab' or 'fpdf' library. Install with: pip install reportlab or pip install fpdf")
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", size=10)
+        for block in blocks:
+            # Encode with 'latin-1' and replacement for compatibility with standard fonts
+            pdf.multi_cell(0, 5, txt=block.encode('latin-1', 'replace').decode('latin-1'))
+        pdf.output(file_path)
+    except Exception as e:
+        raise Exception(f"Error during PDF export: {e}")
+
+def write_docx(file_path, blocks):
+    """Export as Word document"""
+    try:
+        from docx import Document
+    except ImportError:
+        raise ImportError("Word export requires 'python-docx' library. Install with: pip install python-docx")
+    try:
+        doc = Document()
+        doc.add_heading('OCR Results', 0)
+        doc.add_paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        for block in blocks:
+            doc.add_paragraph(block)
+        doc.save(file_path)
+    except Exception as e:
+        raise Exception(f"Error during DOCX export: {e}") # Re-raise for outer handler
+
+def write_rtf(file_path, blocks):
+    """Export as Rich Text Format"""
+    # Simple RTF format - handles basic text, but lacks full formatting support without a dedicated library
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(r"{\rtf1\ansi\deff0 {\fonttbl {\f0 Times New Roman;}}}\f0\fs24 ")
+        for block in blocks:
+            # Escape backslashes and braces, replace newlines with RTF paragraph breaks
+            f.write(block.replace('\\', '\\\\').replace('{', '\\{').replace('}', '\\}').replace('\n', '\\par '))
+        f.write("}")
+
+def write_html(file_path, blocks):
+    """Export as HTML"""
+    import html
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+    <title>OCR Results</title>
+    <meta charset="utf-8">
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; }}
+        .header {{ color: #333; border-bottom: 2px solid #ddd; padding-bottom: 10px; }}
+        .content {{ white-space: pre-wrap; margin-top: 20px; }}
+        .timestamp {{ color: #666; font-size: 0.9em; }}
+    </style>
+</head>
+<body>
+    <h1 class="header">OCR Results</h1>
+    <p class="timestamp">Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+    <div class="content">""")
+        for block in blocks:
+            f.write(html.escape(block, quote=False))
+        f.write("""</div>
+</body>
+</html>""")
+
+EXPORT_WRITERS = {
+    'txt': write_txt,
+    'pdf': write_pdf,
+    'docx': write_docx,
+    'rtf': write_rtf,
+    'html': write_html,
+}
+
+def format_image_report(image_path, image_size, ocr_result, options, plan):
+    """The results-pane text for one OCR'd image: settings, measurements, then the text."""
+    detected_language = ocr_result.detected_language
+    actual_lang_for_ocr = ocr_result.lang
+    average_confidence = ocr_result.average_confidence
+    text = ocr_result.text
+
+    result = f"=== IMAGE OCR RESULTS ===\n"
+    result += f"File: {os.path.basename(image_path)}\n"
+    result += f"Image size: {image_size}\n"
+    result += f"Language (Selected): {options.lang}\n"
+    result += f"Language (Detected): {detected_language}\n" # NEW: Detected language
+    result += f"Language (OCR Used): {actual_lang_for_ocr}\n" # NEW: Actual language used for OCR
+    if ocr_result.speculation:
+        result += f"Speculative OCR: {ocr_result.speculation}\n"
+    result += f"PSM: {options.psm}\n"
+    result += f"OEM: {options.oem}\n" # NEW: Display OEM
+    result += f"OCR Backend: {options.backend}\n"
+    if options.enable_osd:
+        result += f"Orientation (OSD): rotated {ocr_result.rotation}°, script {ocr_result.script or 'unknown'}\n"
+    result += f"Thread Plan: {plan.describe()}\n"
+    result += f"Result Cache: {'hit' if ocr_result.from_cache else ('miss' if options.use_cache else 'disabled')}\n"
+    result += f"Preprocessing Enabled: {options.enable_preprocessing}\n"
+    if options.enable_preprocessing:
+        if 'skew_angle' in ocr_result.preprocess_report:
+            skew_angle = ocr_result.preprocess_report['skew_angle']
+            measured = f"{skew_angle:.1f}°" if skew_angle is not None else "not measurable"
+            result += f"  - Deskewing: skew {measured}\n"
+        else:
+            result += f"  - Deskewing: {options.enable_deskew}\n"
+        result += f"  - Adaptive Threshold: {options.enable_adaptive_threshold}\n"
+        if options.normalize_resolution:
+            text_height = ocr_result.preprocess_report.get('text_height')
+            scale = ocr_result.preprocess_report.get('scale', 1.0)
+            measured = f"{text_height:.0f} px" if text_height else "not measurable"
+            result += f"  - Text Size Normalization: text height {measured}, scaled x{scale:.2f}\n"
+        if 'denoise' in ocr_result.preprocess_report:
+            report = ocr_result.preprocess_report
+            result += f"  - Denoising: {report['denoise']} (noise sigma {report['noise_sigma']:.1f})\n"
+        if ocr_result.preprocess_report.get('stages'):
+            result += f"  - Stages: {PreprocessPipeline.describe(ocr_result.preprocess_report)}\n"
+    result += f"OCR Confidence: {average_confidence:.2f}%\n" # NEW: Display confidence
+    result += f"Characters found: {len(text)}\n"
+    result += f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+    result += "="*50 + "\n\n"
+    
+    if text.strip():
+        result += text
+    else:
+        result += "No text found in image. Try:\n"
+        result += "- Different Page Segmentation Mode (PSM) or OCR Engine Mode (OEM)\n" # MODIFIED: Suggest OEM
+        result += "- Different language setting or disable Auto-Detect Language\n" # MODIFIED: Suggest auto-detect toggle
+        result += "- Adjusting image preprocessing options (Deskewing, Adaptive Thresholding)\n"
+        result += "- Ensuring good image quality (resolution, clarity)\n"
+
+    return result
+
+def main(argv=None):
+    """
+    Command-line OCR: python ocr_engine.py FILE [-o OUT] [options]. PDF pages
+    are written to stdout or OUT as they finish.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="ocr_engine.py", description="OCR a PDF or image without the GUI.")
+    parser.add_argument("file", help="PDF or image to OCR")
+    parser.add_argument("-o", "--output", help="write results here instead of stdout")
+    parser.add_argument("-f", "--format", choices=list(EXPORT_WRITERS.keys()),
+                        help="output format (default: from the --output extension, else txt)")
+    parser.add_argument("--lang", default="eng", help="Tesseract language(s), e.g. eng or eng+deu")
+    parser.add_argument("--no-auto-lang", action="store_true", help="do not detect the language")
+    parser.add_argument("--psm", default="3", help="page segmentation mode")
+    parser.add_argument("--oem", default="3", help="OCR engine mode")
+    parser.add_argument("--backend", choices=list(OCR_BACKENDS.keys()), default=TesseractSubprocessBackend.name)
+    parser.add_argument("--pdf-mode", choices=list(PDF_MODES.keys()), default='images')
+    parser.add_argument("--render-dpi", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=0, help="PDF worker processes (0 = automatic)")
+    parser.add_argument("--no-preprocess", action="store_true", help="skip image preprocessing")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the result cache")
+    parser.add_argument("--no-resume", action="store_true", help="do not journal or resume PDF jobs")
+    parser.add_argument("--partial", action="store_true",
+                        help="output the pages an interrupted PDF job finished, without OCRing the rest")
+    args = parser.parse_args(argv)
+
+    options = OCROptions(
+        lang=args.lang,
+        psm=args.psm,
+        oem=args.oem,
+        backend=args.backend,
+        auto_detect_lang=not args.no_auto_lang,
+        enable_preprocessing=not args.no_preprocess,
+        pdf_workers=max(0, args.workers),
+        use_cache=not args.no_cache,
+        resume_jobs=not args.no_resume,
+        pdf_mode=args.pdf_mode,
+        render_dpi=args.render_dpi,
+    )
+    engine = OCREngine()
+    try:
+        if args.file.lower().endswith('.pdf'):
+            blocks = stream_pdf_ocr(args.file, options, engine, journal_only=args.partial)
+        else:
+            plan = plan_threads(1)
+            plan.apply()
+            img = Image.open(args.file)
+            blocks = [format_image_report(args.file, img.size, engine.recognize(img, options), options, plan) + "\n"]
+
+        if args.output is None:
+            for block in blocks:
+                sys.stdout.write(block)
+                sys.stdout.flush()
+        else:
+            format_type = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+            EXPORT_WRITERS.get(format_type, write_txt)(args.output, blocks)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        engine.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,95 +2,25 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk
 import os
 import sys
-from pathlib import Path
 import subprocess
 import platform
 import tempfile
-import io
 from datetime import datetime
 
-# New imports for image processing
+# The OCR work lives in ocr_engine; this module is the Tk front end
 try:
-    import cv2
-    import numpy as np
     from PIL import Image, ImageGrab
-    # For deskewing
-    from skimage.transform import rotate
-    from skimage.feature import canny
-    from skimage.transform import hough_line, hough_line_peaks
-    from scipy.ndimage import interpolation
-    from langdetect import detect, DetectorFactory # MODIFIED: Added DetectorFactory for consistency
     import pytesseract # NEW: Import pytesseract here for get_languages
+    from ocr_engine import (
+        OCR_BACKENDS, PDF_MODES, ImageProcessor, OCREngine, OCROptions,
+        OCRResultCache, PDFPageCache, PDFRunStats, TesseractSubprocessBackend,
+        format_image_report, main, plan_threads, stream_pdf_ocr,
+        write_docx, write_html, write_pdf, write_rtf, write_txt,
+    )
 except ImportError as e:
     messagebox.showerror("Error", f"Missing core libraries for image processing or language detection. Please install them: {e}\nRefer to 'Show Diagnostics' for details.")
     sys.exit(1) # Exit if critical libraries are missing
 
-# NEW: Set random seed for langdetect for consistent results
-DetectorFactory.seed = 0
-
-print("Starting Enhanced OCR GUI...")
-
-class ImageProcessor:
-    """Handles various image preprocessing tasks."""
-
-    def __init__(self):
-        pass
-
-    def process_image_for_ocr(self, img_pil, enable_deskew=False, enable_adaptive_threshold=False):
-        """
-        Applies a series of preprocessing steps to a PIL image for improved OCR.
-        """
-        img_np = np.array(img_pil.convert('L')) # Convert to grayscale for most processing
-        
-        # --- Image Normalization ---
-        cv2.normalize(img_np, img_np, 0, 255, cv2.NORM_MINMAX)
-
-        # --- Noise Reduction (Advanced) ---
-        img_np = cv2.fastNlMeansDenoising(img_np, None, 10, 7, 21)
-
-        # --- Deskewing ---
-        if enable_deskew:
-            try:
-                # Canny edge detector
-                edges = canny(img_np, sigma=2.0)
-                # Hough transform to find lines
-                h, theta, d = hough_line(edges)
-                # Find the angles of the strongest lines
-                _, angles, _ = hough_line_peaks(h, theta, d)
-
-                # Calculate the average skew angle
-                if angles.size > 0:
-                    # Convert angles from radians to degrees and normalize to -45 to 45
-                    # Skew angle is typically perpendicular to text lines
-                    angle_deg = np.rad2deg(np.mean(angles))
-                    
-                    # Adjust angle for vertical text or common orientations
-                    if abs(angle_deg) > 45:
-                        angle_deg = (angle_deg % 90) - 90 if angle_deg > 0 else (angle_deg % 90)
-
-                    if abs(angle_deg) > 0.1: # Only rotate if angle is significant
-                        img_np = interpolation.rotate(img_np, angle_deg, reshape=False, mode='nearest')
-                        # print(f"Deskewed by {angle_deg:.2f} degrees") # For debugging
-            except Exception as e:
-                print(f"Deskewing failed: {e}") # Log error, but don't stop processing
-
-        # --- Adaptive Thresholding ---
-        if enable_adaptive_threshold:
-            # Use OpenCV's adaptive thresholding
-            img_np = cv2.adaptiveThreshold(
-                img_np, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
-        else:
-            # Convert to binary for Tesseract if not adaptively thresholded
-            # Use OTSU's Binarization as a default for non-adaptive thresholding if not already binary
-            if img_np.dtype == np.uint8: # Ensure it's not already binary (e.g. from TIFF)
-                _, img_np = cv2.threshold(img_np, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-
-        # Convert back to PIL Image
-        img_processed_pil = Image.fromarray(img_np)
-        return img_processed_pil
-
 class EnhancedOCRGUI:
     def __init__(self):
         self.root = tk.Tk()
@@ -99,7 +29,16 @@ class EnhancedOCRGUI:
 
         # Initialize ImageProcessor
         self.image_processor = ImageProcessor()
+
+        # Worker/thread split chosen for the last run (see plan_threads)
+        self.last_thread_plan = None
+
+        # GUI-independent OCR engine; backends are created on first use and reused across runs
+        self.engine = OCREngine(self.image_processor)
         
+        # Set once the installed language packs are known
+        self.osd_available = False
+
         # Check tesseract availability with detailed diagnostics
         self.tesseract_available, self.tesseract_info = self.check_tesseract_detailed()
         
@@ -111,6 +50,7 @@ class EnhancedOCRGUI:
         if self.tesseract_available:
             try:
                 self.tesseract_languages = pytesseract.get_languages(config='')
+                self.osd_available = 'osd' in self.tesseract_languages
                 if 'osd' in self.tesseract_languages: # 'osd' is for orientation and script detection, not for OCR language
                     self.tesseract_languages.remove('osd')
                 self.tesseract_languages.sort()
@@ -123,6 +63,9 @@ class EnhancedOCRGUI:
         else:
             self.tesseract_languages = ['eng', 'por', 'spa', 'fra', 'deu'] # Default if Tesseract not available
 
+        # OSD pre-stage is on by default when its model is installed
+        self.enable_osd_var.set(self.osd_available)
+
         # MODIFIED: Update the language dropdown with actual languages
         self.update_language_dropdown()
         
@@ -327,6 +270,12 @@ class EnhancedOCRGUI:
         self.auto_detect_lang_cb = tk.Checkbutton(lang_frame, text="Auto-Detect Language", variable=self.auto_detect_lang_var)
         self.auto_detect_lang_cb.pack(side="left", padx=10)
 
+        # Speculative OCR: run the main pass in the selected language while detection runs
+        self.speculative_ocr_var = tk.BooleanVar(value=True)
+        self.speculative_ocr_cb = tk.Checkbutton(lang_frame, text="Speculative OCR (overlap with detection)",
+                                                 variable=self.speculative_ocr_var)
+        self.speculative_ocr_cb.pack(side="left", padx=10)
+
         # PSM (Page Segmentation Mode) selection
         psm_frame = tk.Frame(config_frame)
         psm_frame.pack(pady=5, fill="x")
@@ -372,6 +321,68 @@ class EnhancedOCRGUI:
         self.oem_combo['values'] = list(oem_options.keys())
         self.oem_combo.set("3") # Ensure default is shown
         self.oem_combo.pack(side="left", padx=5)
+
+        # OCR backend selection: subprocess (pytesseract) or in-process (tesserocr)
+        backend_frame = tk.Frame(config_frame)
+        backend_frame.pack(pady=5, fill="x")
+
+        tk.Label(backend_frame, text="OCR Backend:").pack(side="left")
+        self.backend_var = tk.StringVar(value=TesseractSubprocessBackend.name)
+        self.backend_combo = ttk.Combobox(backend_frame, textvariable=self.backend_var, width=20, state='readonly')
+        self.backend_combo['values'] = list(OCR_BACKENDS.keys())
+        self.backend_combo.pack(side="left", padx=5)
+        tk.Label(backend_frame, text="(inprocess keeps the model loaded between images; needs tesserocr)",
+                 font=("Arial", 8), fg="gray").pack(side="left", padx=5)
+
+        # Content-addressed result cache (image hash + settings)
+        cache_frame = tk.Frame(config_frame)
+        cache_frame.pack(pady=5, fill="x")
+
+        self.use_cache_var = tk.BooleanVar(value=True)
+        self.use_cache_cb = tk.Checkbutton(cache_frame, text="Cache OCR Results (skip repeated images/settings)",
+                                           variable=self.use_cache_var)
+        self.use_cache_cb.pack(side="left")
+
+        # Journal finished PDF pages so a crashed or closed run picks up where it stopped
+        self.resume_jobs_var = tk.BooleanVar(value=True)
+        self.resume_jobs_cb = tk.Checkbutton(cache_frame, text="Resume Interrupted PDF Jobs",
+                                             variable=self.resume_jobs_var)
+        self.resume_jobs_cb.pack(side="left")
+
+        # OSD pre-stage: auto-rotate 90/180/270 and choose the model family from the script
+        self.enable_osd_var = tk.BooleanVar(value=False)
+        self.enable_osd_cb = tk.Checkbutton(cache_frame, text="Auto-Rotate & Detect Script (OSD)",
+                                            variable=self.enable_osd_var)
+        self.enable_osd_cb.pack(side="left", padx=10)
+
+        # PDF worker processes: pages are OCR'd in parallel when > 1, 0 = automatic
+        workers_frame = tk.Frame(config_frame)
+        workers_frame.pack(pady=5, fill="x")
+
+        tk.Label(workers_frame, text="PDF Worker Processes:").pack(side="left")
+        self.pdf_workers_var = tk.IntVar(value=0)
+        self.pdf_workers_spin = tk.Spinbox(workers_frame, from_=0, to=max(1, os.cpu_count() or 1),
+                                           textvariable=self.pdf_workers_var, width=5)
+        self.pdf_workers_spin.pack(side="left", padx=5)
+        tk.Label(workers_frame, text="(0 = automatic, balanced against Tesseract/OpenCV threads)",
+                 font=("Arial", 8), fg="gray").pack(side="left", padx=5)
+
+        # PDF mode: OCR the embedded images, or render each page and OCR the render
+        pdf_mode_frame = tk.Frame(config_frame)
+        pdf_mode_frame.pack(pady=5, fill="x")
+
+        tk.Label(pdf_mode_frame, text="PDF Mode:").pack(side="left")
+        self.pdf_mode_var = tk.StringVar(value='images')
+        self.pdf_mode_combo = ttk.Combobox(pdf_mode_frame, textvariable=self.pdf_mode_var, width=10, state='readonly')
+        self.pdf_mode_combo['values'] = list(PDF_MODES.keys())
+        self.pdf_mode_combo.pack(side="left", padx=5)
+        tk.Label(pdf_mode_frame, text="Render DPI:").pack(side="left", padx=(10, 0))
+        self.render_dpi_var = tk.IntVar(value=300)
+        self.render_dpi_spin = tk.Spinbox(pdf_mode_frame, from_=72, to=600, increment=50,
+                                          textvariable=self.render_dpi_var, width=5)
+        self.render_dpi_spin.pack(side="left", padx=5)
+        tk.Label(pdf_mode_frame, text="(render: whole pages; hybrid: skip images the text layer covers)",
+                 font=("Arial", 8), fg="gray").pack(side="left", padx=5)
         
         # NEW: Image Preprocessing Options (kept from previous step)
         preprocess_frame = tk.LabelFrame(self.root, text="Image Preprocessing Options")
@@ -396,6 +407,13 @@ class EnhancedOCRGUI:
         self.enable_adaptive_threshold_cb.pack(anchor="w", padx=5)
         self.enable_preprocessing_var.trace_add("write", lambda *args: self.enable_adaptive_threshold_cb.config(state=tk.NORMAL if self.enable_preprocessing_var.get() else tk.DISABLED))
 
+        self.normalize_resolution_var = tk.BooleanVar(value=True)
+        self.normalize_resolution_cb = tk.Checkbutton(preprocess_frame, text="Normalize Text Size (rescale to ~28 px characters; faster on high-DPI scans)",
+                                                      variable=self.normalize_resolution_var,
+                                                      state=tk.NORMAL if self.enable_preprocessing_var.get() else tk.DISABLED)
+        self.normalize_resolution_cb.pack(anchor="w", padx=5)
+        self.enable_preprocessing_var.trace_add("write", lambda *args: self.normalize_resolution_cb.config(state=tk.NORMAL if self.enable_preprocessing_var.get() else tk.DISABLED))
+
         
         # Process button
         self.process_btn = tk.Button(self.root, text="Extract Text", 
@@ -478,7 +496,11 @@ class EnhancedOCRGUI:
         # Add system info
         text_widget.insert(tk.END, "=== SYSTEM INFORMATION ===\n")
         text_widget.insert(tk.END, f"Platform: {platform.system()} {platform.release()}\n")
-        text_widget.insert(tk.END, f"Python: {sys.version}\n\n")
+        text_widget.insert(tk.END, f"Python: {sys.version}\n")
+        text_widget.insert(tk.END, f"CPUs: {os.cpu_count()}\n")
+        if self.last_thread_plan is not None:
+            text_widget.insert(tk.END, f"Last thread plan: {self.last_thread_plan.describe()}\n")
+        text_widget.insert(tk.END, "\n")
         
         # Add tesseract diagnostics
         text_widget.insert(tk.END, "=== TESSERACT DIAGNOSTICS ===\n")
@@ -499,6 +521,25 @@ class EnhancedOCRGUI:
             except Exception as e:
                 text_widget.insert(tk.END, f"  Error retrieving Tesseract language packs: {e}\n")
 
+        # OCR result cache
+        text_widget.insert(tk.END, "\n=== OCR RESULT CACHE ===\n")
+        try:
+            cache = self.engine.cache or OCRResultCache(self.get_ocr_options().cache_dir)
+            stats = cache.stats()
+            text_widget.insert(tk.END, f"Location: {stats['dir']}\n")
+            text_widget.insert(tk.END, f"Entries: {stats['entries']} ({stats['bytes'] / (1024 * 1024):.1f} MB of {stats['max_bytes'] / (1024 * 1024):.0f} MB)\n")
+            text_widget.insert(tk.END, f"Hits this session: {stats['hits']}\n")
+            text_widget.insert(tk.END, f"Misses this session: {stats['misses']}\n")
+        except Exception as e:
+            text_widget.insert(tk.END, f"  Error reading cache: {e}\n")
+        try:
+            page_cache = self.engine.page_cache or PDFPageCache(self.get_ocr_options().cache_dir)
+            stats = page_cache.stats()
+            text_widget.insert(tk.END, f"PDF pages: {stats['entries']} ({stats['bytes'] / (1024 * 1024):.1f} MB), "
+                                       f"{stats['hits']} unchanged page(s) reused this session\n")
+        except Exception as e:
+            text_widget.insert(tk.END, f"  Error reading PDF page cache: {e}\n")
+
         # Check additional libraries
         text_widget.insert(tk.END, "\n=== REQUIRED LIBRARIES CHECK ===\n")
         
@@ -506,13 +547,13 @@ class EnhancedOCRGUI:
             ("pytesseract", "Core OCR engine wrapper"),
             ("pillow", "Image processing (for PIL)"),
             ("opencv-python", "Advanced image processing (CV2)"),
-            ("numpy", "Numerical operations (used by CV2, scikit-image)"),
+            ("numpy", "Numerical operations (used by CV2)"),
             ("PyMuPDF", "PDF handling"),
             ("python-docx", "Word document export"),
             ("reportlab", "PDF export (primary)"),
             ("fpdf", "PDF export (alternative)"),
             ("langdetect", "Automatic language detection"),
-            ("scikit-image", "Image processing (for deskewing)")
+            ("tesserocr", "In-process OCR backend (optional)")
         ]
         
         for lib_name, purpose in libs_to_check:
@@ -524,8 +565,6 @@ class EnhancedOCRGUI:
                     __import__("cv2")
                 elif lib_name == "python-docx":
                     __import__("docx")
-                elif lib_name == "scikit-image":
-                    __import__("skimage")
                 else:
                     __import__(lib_name)
                 text_widget.insert(tk.END, f"✓ {lib_name} - {purpose}\n")
@@ -538,7 +577,9 @@ class EnhancedOCRGUI:
         text_widget.insert(tk.END, "Core OCR & Image Processing:\n")
         text_widget.insert(tk.END, "pip install pytesseract pillow opencv-python numpy PyMuPDF\n\n")
         text_widget.insert(tk.END, "Export & Advanced Features:\n")
-        text_widget.insert(tk.END, "pip install python-docx reportlab fpdf langdetect scikit-image\n\n")
+        text_widget.insert(tk.END, "pip install python-docx reportlab fpdf langdetect\n\n")
+        text_widget.insert(tk.END, "In-process OCR backend (optional):\n")
+        text_widget.insert(tk.END, "pip install tesserocr\n\n")
         
         if platform.system() == "Windows":
             text_widget.insert(tk.END, "Windows - Tesseract Installation:\n")
@@ -583,13 +624,11 @@ class EnhancedOCRGUI:
         self.root.update()
         
         try:
+            self.results_text.delete(1.0, tk.END)
             if file_path.lower().endswith('.pdf'):
-                result = self.process_pdf(file_path)
+                self.process_pdf(file_path) # Fills the results pane page by page
             else:
-                result = self.process_image(file_path)
-            
-            self.results_text.delete(1.0, tk.END)
-            self.results_text.insert(tk.END, result)
+                self.results_text.insert(tk.END, self.process_image(file_path))
             self.status_label.config(text="Complete! Ready to export.", fg="green")
             
         except Exception as e:
@@ -601,235 +640,77 @@ class EnhancedOCRGUI:
         finally:
             self.process_btn.config(state="normal")
     
+    def get_ocr_options(self):
+        """Snapshot the current GUI settings into an OCROptions object."""
+        try:
+            pdf_workers = max(0, int(self.pdf_workers_var.get()))
+        except (tk.TclError, ValueError):
+            pdf_workers = 0
+        try:
+            render_dpi = min(1200, max(72, int(self.render_dpi_var.get())))
+        except (tk.TclError, ValueError):
+            render_dpi = 300
+        return OCROptions(
+            lang=self.lang_var.get(),
+            psm=self.psm_var.get(),
+            oem=self.oem_var.get(),
+            backend=self.backend_var.get(),
+            auto_detect_lang=self.auto_detect_lang_var.get(),
+            enable_preprocessing=self.enable_preprocessing_var.get(),
+            enable_deskew=self.enable_deskew_var.get(),
+            enable_adaptive_threshold=self.enable_adaptive_threshold_var.get(),
+            pdf_workers=pdf_workers,
+            use_cache=self.use_cache_var.get(),
+            resume_jobs=self.resume_jobs_var.get(),
+            enable_osd=self.enable_osd_var.get(),
+            speculative_ocr=self.speculative_ocr_var.get(),
+            normalize_resolution=self.normalize_resolution_var.get(),
+            pdf_mode=self.pdf_mode_var.get(),
+            render_dpi=render_dpi,
+        )
+
     # MODIFIED: process_image to include OEM, auto-detect, and confidence
     def process_image(self, image_path):
         try:
-            # pytesseract and PIL imports are now top-level
+            options = self.get_ocr_options()
             
             # Load image
             img = Image.open(image_path)
             
-            # Apply preprocessing if enabled
-            if self.enable_preprocessing_var.get():
-                processed_img_pil = self.image_processor.process_image_for_ocr(
-                    img,
-                    enable_deskew=self.enable_deskew_var.get(),
-                    enable_adaptive_threshold=self.enable_adaptive_threshold_var.get()
-                )
-            else:
-                # Ensure it's in a Tesseract-friendly format if no preprocessing
-                # Tesseract generally likes 1-bit (binary), 8-bit (grayscale), or 24-bit (RGB)
-                if img.mode not in ['1', 'L', 'RGB']:
-                    processed_img_pil = img.convert('RGB')
-                else:
-                    processed_img_pil = img
+            # A single image is one unit of work: no outer workers, inner threads get the CPUs
+            plan = plan_threads(1)
+            plan.apply()
+            self.last_thread_plan = plan
 
-            # NEW: Automatic Language Detection
-            detected_language = "N/A"
-            actual_lang_for_ocr = self.lang_var.get()
-
-            if self.auto_detect_lang_var.get():
-                try:
-                    # Perform a quick OCR on a sample to detect language
-                    # Use a very sparse PSM and default language for detection pass
-                    temp_config_for_detection = f'--oem {self.oem_var.get()} --psm 7' # PSM 7: Treat the image as a single text line
-                    temp_text_for_detection = pytesseract.image_to_string(processed_img_pil, config=temp_config_for_detection)
-                    
-                    if temp_text_for_detection.strip():
-                        detected_language = detect(temp_text_for_detection.strip())
-                        if detected_language in self.tesseract_languages:
-                            actual_lang_for_ocr = detected_language
-                        else:
-                            detected_language = f"{detected_language} (Tesseract pack not installed)"
-                            actual_lang_for_ocr = self.lang_var.get() # Revert to selected if pack not available
-                    else:
-                        detected_language = "None (no text detected for auto-detection)"
-                except Exception as e:
-                    detected_language = f"Error: {e}"
-                
-            # Configure tesseract using selected/detected language and OEM
-            custom_config = f'--oem {self.oem_var.get()} --psm {self.psm_var.get()} -l {actual_lang_for_ocr}'
-            
-            # Extract text with confidence data
-            data = pytesseract.image_to_data(processed_img_pil, config=custom_config, output_type=pytesseract.Output.DICT)
-            
-            # Calculate average confidence
-            confidences = [int(c) for c in data['conf'] if int(c) != -1]
-            average_confidence = sum(confidences) / len(confidences) if confidences else 0
-            
-            # Reconstruct text (image_to_string is simpler, but image_to_data gives confidence)
-            text = pytesseract.image_to_string(processed_img_pil, config=custom_config) # Easier to get clean text
-            
-            result = f"=== IMAGE OCR RESULTS ===\n"
-            result += f"File: {os.path.basename(image_path)}\n"
-            result += f"Image size: {img.size}\n"
-            result += f"Language (Selected): {self.lang_var.get()}\n"
-            result += f"Language (Detected): {detected_language}\n" # NEW: Detected language
-            result += f"Language (OCR Used): {actual_lang_for_ocr}\n" # NEW: Actual language used for OCR
-            result += f"PSM: {self.psm_var.get()}\n"
-            result += f"OEM: {self.oem_var.get()}\n" # NEW: Display OEM
-            result += f"Preprocessing Enabled: {self.enable_preprocessing_var.get()}\n"
-            if self.enable_preprocessing_var.get():
-                result += f"  - Deskewing: {self.enable_deskew_var.get()}\n"
-                result += f"  - Adaptive Threshold: {self.enable_adaptive_threshold_var.get()}\n"
-            result += f"OCR Confidence: {average_confidence:.2f}%\n" # NEW: Display confidence
-            result += f"Characters found: {len(text)}\n"
-            result += f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            result += "="*50 + "\n\n"
-            
-            if text.strip():
-                result += text
-            else:
-                result += "No text found in image. Try:\n"
-                result += "- Different Page Segmentation Mode (PSM) or OCR Engine Mode (OEM)\n" # MODIFIED: Suggest OEM
-                result += "- Different language setting or disable Auto-Detect Language\n" # MODIFIED: Suggest auto-detect toggle
-                result += "- Adjusting image preprocessing options (Deskewing, Adaptive Thresholding)\n"
-                result += "- Ensuring good image quality (resolution, clarity)\n"
-            
-            return result
+            # Preprocessing, language detection and OCR, or a single cache lookup
+            # when this exact image was already processed with these settings
+            ocr_result = self.engine.recognize(img, options)
+            return format_image_report(image_path, img.size, ocr_result, options, plan)
             
         except Exception as e:
             return f"Error processing image: {str(e)}\n\nTroubleshooting:\n1. Check if file is a valid image\n2. Verify Tesseract installation and language packs (see 'Show Diagnostics')\n3. Check file permissions\n4. Ensure all Python dependencies are installed (see 'Show Diagnostics')"
     
-    # MODIFIED: process_pdf to include OEM, auto-detect, and confidence
+    # MODIFIED: process_pdf streams pages into the results pane as they finish
     def process_pdf(self, pdf_path):
+        """OCR a PDF, appending each page's text to the results pane as soon as it is done."""
         try:
-            # Check if PyMuPDF is available
-            try:
-                import fitz  # PyMuPDF
-            except ImportError:
-                return "Error: PyMuPDF not installed. Install with: pip install PyMuPDF"
-            
-            # pytesseract and PIL imports are now top-level
-            import io
-            
-            doc = fitz.open(pdf_path)
-            all_text = []
-            total_confidence = 0
-            total_words = 0
-            
-            # NEW: Automatic Language Detection for PDF (sample from first page)
-            detected_language = "N/A"
-            actual_lang_for_ocr = self.lang_var.get()
-
-            if self.auto_detect_lang_var.get() and len(doc) > 0:
-                try:
-                    # Get image from first page for quick language detection
-                    page_for_detection = doc[0]
-                    pix = page_for_detection.get_pixmap()
-                    pil_img_for_detection = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-
-                    # Apply preprocessing to detection image as well for better detection accuracy
-                    if self.enable_preprocessing_var.get():
-                        pil_img_for_detection = self.image_processor.process_image_for_ocr(
-                            pil_img_for_detection,
-                            enable_deskew=self.enable_deskew_var.get(),
-                            enable_adaptive_threshold=self.enable_adaptive_threshold_var.get()
-                        )
-                    
-                    temp_config_for_detection = f'--oem {self.oem_var.get()} --psm 7'
-                    temp_text_for_detection = pytesseract.image_to_string(pil_img_for_detection, config=temp_config_for_detection)
-                    
-                    if temp_text_for_detection.strip():
-                        detected_language = detect(temp_text_for_detection.strip())
-                        if detected_language in self.tesseract_languages:
-                            actual_lang_for_ocr = detected_language
-                        else:
-                            detected_language = f"{detected_language} (Tesseract pack not installed)"
-                            actual_lang_for_ocr = self.lang_var.get()
-                    else:
-                        detected_language = "None (no text detected for auto-detection)"
-                except Exception as e:
-                    detected_language = f"Error: {e}"
-            
-            all_text.append(f"=== PDF OCR RESULTS ===")
-            all_text.append(f"File: {os.path.basename(pdf_path)}")
-            all_text.append(f"Pages: {len(doc)}")
-            all_text.append(f"Language (Selected): {self.lang_var.get()}")
-            all_text.append(f"Language (Detected): {detected_language}")
-            all_text.append(f"Language (OCR Used): {actual_lang_for_ocr}")
-            all_text.append(f"PSM: {self.psm_var.get()}")
-            all_text.append(f"OEM: {self.oem_var.get()}") # NEW: Display OEM
-            all_text.append(f"Preprocessing Enabled: {self.enable_preprocessing_var.get()}")
-            if self.enable_preprocessing_var.get():
-                all_text.append(f"  - Deskewing: {self.enable_deskew_var.get()}")
-                all_text.append(f"  - Adaptive Threshold: {self.enable_adaptive_threshold_var.get()}")
-            all_text.append(f"Processed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            all_text.append("="*50)
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # Get regular text
-                regular_text = page.get_text()
-                if regular_text.strip():
-                    all_text.append(f"\n=== Page {page_num + 1} - Regular Text (Directly Extracted) ===")
-                    all_text.append(regular_text)
-                
-                # Get images and OCR them
-                images = page.get_images()
-                if images:
-                    all_text.append(f"\n=== Page {page_num + 1} - Embedded Images ({len(images)} found) ===")
-                    
-                    for img_index, img in enumerate(images):
-                        try:
-                            xref = img[0]
-                            pix = fitz.Pixmap(doc, xref)
-                            
-                            # Convert Pixmap to PIL Image
-                            if pix.n - pix.alpha < 4:  # grayscale or RGB
-                                img_data = pix.tobytes("png") # Use PNG for better quality
-                                pil_img = Image.open(io.BytesIO(img_data))
-                            else: # RGBA
-                                pix = fitz.Pixmap(fitz.csRGB, pix) # Drop alpha channel
-                                img_data = pix.tobytes("png")
-                                pil_img = Image.open(io.BytesIO(img_data))
-
-                            # Apply preprocessing if enabled
-                            if self.enable_preprocessing_var.get():
-                                pil_img = self.image_processor.process_image_for_ocr(
-                                    pil_img,
-                                    enable_deskew=self.enable_deskew_var.get(),
-                                    enable_adaptive_threshold=self.enable_adaptive_threshold_var.get()
-                                )
-                            else:
-                                # Ensure it's in a Tesseract-friendly format if no preprocessing
-                                if pil_img.mode not in ['1', 'L', 'RGB']:
-                                    pil_img = pil_img.convert('RGB')
-                            
-                            # Configure tesseract with ACTUAL_LANG_FOR_OCR
-                            custom_config = f'--oem {self.oem_var.get()} --psm {self.psm_var.get()} -l {actual_lang_for_ocr}'
-                            
-                            # Extract text with confidence data
-                            data = pytesseract.image_to_data(pil_img, config=custom_config, output_type=pytesseract.Output.DICT)
-                            
-                            confidences = [int(c) for c in data['conf'] if int(c) != -1]
-                            current_text = pytesseract.image_to_string(pil_img, config=custom_config) # To get clean text
-
-                            if confidences:
-                                total_confidence += sum(confidences)
-                                total_words += len(confidences)
+            import fitz  # PyMuPDF
+        except ImportError:
+            self.results_text.insert(tk.END, "Error: PyMuPDF not installed. Install with: pip install PyMuPDF")
+            return
 
-                            if current_text.strip():
-                                all_text.append(f"\n--- Embedded Image {img_index + 1} (OCR Results) ---")
-                                all_text.append(current_text)
-                            else:
-                                all_text.append(f"\n--- Embedded Image {img_index + 1} (no text found after OCR) ---")
-                            
-                            pix = None # Release memory
-                        except Exception as e:
-                            all_text.append(f"\n--- Embedded Image {img_index + 1} Error during OCR: {str(e)} ---")
-            
-            doc.close()
-            
-            # Add overall confidence for PDF
-            average_confidence = total_confidence / total_words if total_words > 0 else 0
-            all_text.insert(7, f"Overall OCR Confidence: {average_confidence:.2f}%\n") # Insert after OEM line
-            
-            return "\n".join(all_text) if all_text else "No text found in PDF"
-            
+        options = self.get_ocr_options()
+        stats = PDFRunStats()
+        try:
+            for block in stream_pdf_ocr(pdf_path, options, self.engine, stats):
+                self.last_thread_plan = stats.plan
+                self.results_text.insert(tk.END, block)
+                if stats.pages_done:
+                    self.results_text.see(tk.END)
+                self.status_label.config(text=f"Processing... page {stats.pages_done}/{stats.page_count}", fg="orange")
+                self.root.update()
         except Exception as e:
-            return f"Error processing PDF: {str(e)}\n\nTroubleshooting:\n1. Install PyMuPDF: pip install PyMuPDF\n2. Check if PDF is readable\n3. Verify Tesseract installation and language packs (see 'Show Diagnostics')\n4. Ensure all Python dependencies are installed (see 'Show Diagnostics')"
+            self.results_text.insert(tk.END, f"\nError processing PDF: {str(e)}\n\nTroubleshooting:\n1. Install PyMuPDF: pip install PyMuPDF\n2. Check if PDF is readable\n3. Verify Tesseract installation and language packs (see 'Show Diagnostics')\n4. Ensure all Python dependencies are installed (see 'Show Diagnostics')")
     
     def quick_save_txt(self):
         """Quick save as text file with timestamp"""
@@ -903,100 +784,23 @@ class EnhancedOCRGUI:
     
     def export_txt(self, file_path, text):
         """Export as plain text"""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(text)
+        write_txt(file_path, [text])
     
     def export_pdf(self, file_path, text):
-        """Export as PDF using ReportLab with better text wrapping and encoding handling."""
-        try:
-            from reportlab.platypus import SimpleDocTemplate, Paragraph
-            from reportlab.lib.styles import getSampleStyleSheet
-            from reportlab.lib.pagesizes import letter
-            
-            doc = SimpleDocTemplate(file_path, pagesize=letter)
-            styles = getSampleStyleSheet()
-            style = styles["Normal"]
-            
-            # Replace newlines with <br/> tags for Paragraph, which handles rich text.
-            formatted_text = text.replace('\n', '<br/>\n')
-            
-            story = [Paragraph(formatted_text, style)]
-            
-            doc.build(story)
-
-        except ImportError:
-            # Fallback to fpdf if reportlab not available
-            try:
-                from fpdf import FPDF
-                
-                pdf = FPDF()
-                pdf.add_page()
-                pdf.set_font("Arial", size=10)
-                
-                # Use multi_cell for better text block handling
-                # Encode with 'latin-1' and replacement for compatibility with standard fonts
-                encoded_text = text.encode('latin-1', 'replace').decode('latin-1')
-                pdf.multi_cell(0, 5, txt=encoded_text)
-
-                pdf.output(file_path)
-                
-            except ImportError:
-                raise ImportError("PDF export requires 'reportlab' or 'fpdf' library. Install with: pip install reportlab or pip install fpdf")
-        except Exception as e:
-            raise Exception(f"Error during PDF export: {e}")
+        """Export as PDF (ReportLab, or fpdf as a fallback)"""
+        write_pdf(file_path, [text])
     
     def export_docx(self, file_path, text):
         """Export as Word document"""
-        try:
-            from docx import Document
-            
-            doc = Document()
-            doc.add_heading('OCR Results', 0)
-            doc.add_paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            doc.add_paragraph(text)
-            doc.save(file_path)
-            
-        except ImportError:
-            raise ImportError("Word export requires 'python-docx' library. Install with: pip install python-docx")
-        except Exception as e:
-            raise Exception(f"Error during DOCX export: {e}") # Re-raise for outer handler
+        write_docx(file_path, [text])
     
     def export_rtf(self, file_path, text):
         """Export as Rich Text Format"""
-        # Simple RTF format - handles basic text, but lacks full formatting support without a dedicated library
-        rtf_header = r"{\rtf1\ansi\deff0 {\fonttbl {\f0 Times New Roman;}}}"
-        # Escape backslashes and braces, replace newlines with RTF paragraph breaks
-        rtf_content = text.replace('\\', '\\\\').replace('{', '\\{').replace('}', '\\}').replace('\n', '\\par ')
-        rtf_footer = "}"
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(f"{rtf_header}\\f0\\fs24 {rtf_content}{rtf_footer}")
+        write_rtf(file_path, [text])
     
     def export_html(self, file_path, text):
         """Export as HTML"""
-        # Basic HTML escaping for safety
-        escaped_text = text.replace('<', '&lt;').replace('>', '&gt;').replace('&', '&amp;')
-        html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <title>OCR Results</title>
-    <meta charset="utf-8">
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; }}
-        .header {{ color: #333; border-bottom: 2px solid #ddd; padding-bottom: 10px; }}
-        .content {{ white-space: pre-wrap; margin-top: 20px; }}
-        .timestamp {{ color: #666; font-size: 0.9em; }}
-    </style>
-</head>
-<body>
-    <h1 class="header">OCR Results</h1>
-    <p class="timestamp">Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-    <div class="content">{escaped_text}</div>
-</body>
-</html>"""
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        write_html(file_path, [text])
     
     def clear_results(self):
         self.results_text.delete(1.0, tk.END)
@@ -1013,9 +817,13 @@ class EnhancedOCRGUI:
         print("- Image preprocessing options (Deskew, Adaptive Threshold)")
         print("- Multiple export formats (TXT, PDF, DOCX, RTF, HTML)")
         self.root.mainloop()
+        self.engine.close()
         print("GUI closed.")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    print("Starting Enhanced OCR GUI...")
     try:
         app = EnhancedOCRGUI()
         app.run()
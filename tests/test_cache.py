@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from ocr_engine import OCRResult, OCRResultCache, OCRWord
+
+def make_result(text):
+    return OCRResult([OCRWord(text, 10, 20, 30, 12, 95.0, block_num=1, par_num=1, line_num=1, word_num=1)])
+
+def test_make_key_hashes_pixels_and_signature():
+    pixels = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    key = OCRResultCache.make_key(pixels, "lang=eng")
+    assert OCRResultCache.make_key(Image.fromarray(pixels), "lang=eng") == key
+    assert OCRResultCache.make_key(pixels, "lang=deu") != key
+    changed = pixels.copy()
+    changed[0, 0] = 255
+    assert OCRResultCache.make_key(changed, "lang=eng") != key
+
+def test_put_get_round_trip(tmp_path):
+    cache = OCRResultCache(str(tmp_path))
+    assert cache.get("missing") is None
+    cache.put("key", make_result("cached"))
+    assert cache.contains("key")
+    result = cache.get("key")
+    assert result.text == "cached\n"
+    assert result.from_cache
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = OCRResultCache(str(tmp_path))
+    with open(os.path.join(cache.cache_dir, "torn.json"), "w") as f:
+        f.write('{"words": [')
+    assert cache.get("torn") is None
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = OCRResultCache(str(tmp_path))
+    cache.put("a", make_result("aaaa"))
+    entry_size = os.path.getsize(cache._path("a"))
+    # Room for three entries: the fourth put must evict exactly one
+    cache = OCRResultCache(str(tmp_path), max_bytes=3 * entry_size + entry_size // 2)
+    cache.put("b", make_result("bbbb"))
+    cache.put("c", make_result("cccc"))
+    for age, key in enumerate(["a", "b", "c"]):
+        os.utime(cache._path(key), (1000 + age, 1000 + age))
+    assert cache.get("a") is not None # Now the most recently used
+
+    cache.put("d", make_result("dddd"))
+    assert not cache.contains("b")
+    assert all(cache.contains(key) for key in ["a", "c", "d"])
+    assert cache.total_bytes() <= cache.max_bytes
+
+def test_overwriting_an_entry_keeps_the_total(tmp_path):
+    cache = OCRResultCache(str(tmp_path))
+    cache.put("key", make_result("first"))
+    total = cache.total_bytes()
+    for _ in range(3):
+        cache.put("key", make_result("first"))
+    assert cache.total_bytes() == total == os.path.getsize(cache._path("key"))
+
+def test_eviction_trims_to_the_low_water_mark(tmp_path, monkeypatch):
+    cache = OCRResultCache(str(tmp_path))
+    cache.put("probe", make_result("0000"))
+    entry_size = os.path.getsize(cache._path("probe"))
+    os.remove(cache._path("probe"))
+    cache = OCRResultCache(str(tmp_path), max_bytes=10 * entry_size, low_water=0.5)
+    scans = []
+    entries = cache._entries
+    monkeypatch.setattr(cache, "_entries", lambda: scans.append(1) or entries())
+
+    for i in range(11):
+        cache.put(f"{i:04d}", make_result(f"{i:04d}"))
+        os.utime(cache._path(f"{i:04d}"), (1000 + i, 1000 + i))
+    assert len(scans) == 2 # Sizing the cache once, then one eviction
+    assert cache.total_bytes() <= 5 * entry_size
+    assert not cache.contains("0000") and cache.contains("0010")
+
+    for i in range(11, 16):
+        cache.put(f"{i:04d}", make_result(f"{i:04d}"))
+    assert len(scans) == 2 # Room was left, no rescans
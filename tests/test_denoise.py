@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+import pytest
+
+from ocr_engine import ImageProcessor
+
+def text_page(width=1200, height=900, background=255):
+    page = np.full((height, width), background, np.uint8)
+    for y in range(60, height - 40, 50):
+        cv2.putText(page, "Noise level selects the filter", (40, y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2)
+    return page
+
+def gaussian(page, sigma):
+    """Additive noise; use a grey page, on white half of it is clipped away."""
+    noise = np.random.default_rng(0).normal(0, sigma, page.shape)
+    return np.clip(page + noise, 0, 255).astype(np.uint8)
+
+def salt_and_pepper(page, fraction):
+    page = page.copy()
+    rng = np.random.default_rng(0)
+    spots = rng.random(page.shape) < fraction
+    page[spots] = rng.choice([0, 255], size=int(spots.sum())).astype(np.uint8)
+    return page
+
+def jpeg(page, quality):
+    return cv2.imdecode(cv2.imencode(".jpg", page, [cv2.IMWRITE_JPEG_QUALITY, quality])[1], cv2.IMREAD_GRAYSCALE)
+
+@pytest.mark.parametrize("make, expected", [
+    (lambda page: page, 'none'),
+    (lambda page: salt_and_pepper(page, 0.01), 'median'),
+    (lambda page: jpeg(page, 20), 'bilateral'), # Ringing around glyphs on an otherwise clean page
+    (lambda page: gaussian(page // 2 + 64, 5), 'bilateral'),
+    (lambda page: gaussian(page // 2 + 64, 15), 'nlmeans'),
+])
+def test_auto_picks_the_filter_for_the_noise(make, expected):
+    report = {}
+    method, sigma = ImageProcessor().choose_denoise(make(text_page()), report=report)
+    assert method == expected
+    assert report['denoise'] == method and report['noise_sigma'] == round(sigma, 2)
+
+def test_modes_override_the_measurement():
+    processor = ImageProcessor()
+    assert processor.choose_denoise(gaussian(text_page(), 15), mode='off')[0] == 'none'
+    assert processor.choose_denoise(text_page(), mode='nlmeans')[0] == 'nlmeans'
+
+def test_sigma_tracks_gaussian_noise():
+    processor = ImageProcessor()
+    for sigma in (4, 10, 20):
+        assert processor.choose_denoise(gaussian(text_page(background=160), sigma))[1] == pytest.approx(sigma, rel=0.25)
@@ -0,0 +1,31 @@
+import math
+
+import cv2
+import numpy as np
+import pytest
+
+from ocr_engine import ImageProcessor
+
+def skewed_page(angle, width=1600, height=1200, spacing=40):
+    """Dashed 'text lines' across the whole page, descending to the right for positive angles."""
+    img = np.full((height, width), 255, np.uint8)
+    slope = math.tan(math.radians(angle))
+    reach = int(width * abs(slope)) + spacing # Lines start above the page so ink reaches every corner
+    for y0 in range(-reach, height + reach, spacing):
+        for x in range(0, width, 90):
+            cv2.line(img, (x, int(y0 + x * slope)), (x + 60, int(y0 + (x + 60) * slope)), 0, 10)
+    return img
+
+@pytest.mark.parametrize("angle", [-15.0, -14.6, -7.3, -2.0, 0.0, 0.5, 3.4, 9.0, 14.6, 15.0])
+def test_estimates_known_angles(angle):
+    assert ImageProcessor().estimate_skew_angle(skewed_page(angle)) == pytest.approx(angle, abs=0.2)
+
+def test_blank_page_has_no_angle():
+    assert ImageProcessor().estimate_skew_angle(np.full((800, 600), 255, np.uint8)) is None
+
+def test_rotate_undoes_the_estimate():
+    processor = ImageProcessor()
+    page = skewed_page(6.0)
+    straightened = processor.rotate(page, processor.estimate_skew_angle(page))
+    assert straightened.shape == page.shape
+    assert processor.estimate_skew_angle(straightened) == pytest.approx(0.0, abs=0.3)
@@ -0,0 +1,62 @@
+import pytest
+
+from ocr_engine import OCRResult, OCROptions, OCRWord, PDFJobJournal
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    # The journal only hashes the file's bytes
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.7 not really a document")
+    return str(path)
+
+def page(page_num, text):
+    result = OCRResult([OCRWord(text, 1, 2, 3, 4, 90.0, block_num=1, par_num=1, line_num=1, word_num=1)])
+    return {'page_num': page_num, 'regular_text': f"layer {page_num}", 'cache_hits': 0, 'cache_misses': 1,
+            'images': [{'index': 0, 'result': result, 'error': None}], 'page_ocr': None}
+
+def open_journal(pdf_path, tmp_path, lang='eng'):
+    return PDFJobJournal(pdf_path, OCROptions(lang=lang), lang, str(tmp_path / "cache"))
+
+def test_recorded_pages_survive_a_restart(pdf_path, tmp_path):
+    journal = open_journal(pdf_path, tmp_path)
+    assert journal.done_pages() == set()
+    journal.record(page(0, "zero"))
+    journal.record(page(2, "two"))
+
+    restarted = open_journal(pdf_path, tmp_path)
+    assert restarted.done_pages() == {0, 2}
+    restored = restarted.load_page(2)
+    assert restored['resumed']
+    assert restored['regular_text'] == "layer 2"
+    assert restored['images'][0]['result'].text == "two\n"
+
+def test_torn_last_line_is_ignored_and_overwritten(pdf_path, tmp_path):
+    journal = open_journal(pdf_path, tmp_path)
+    journal.record(page(0, "zero"))
+    with open(journal.path, 'ab') as f:
+        f.write(b'{"page_num": 1, "regular_text": "cut sh') # Crash mid-write
+
+    restarted = open_journal(pdf_path, tmp_path)
+    assert restarted.done_pages() == {0}
+    restarted.record(page(1, "one"))
+
+    again = open_journal(pdf_path, tmp_path)
+    assert again.done_pages() == {0, 1}
+    assert again.load_page(1)['images'][0]['result'].text == "one\n"
+    assert again.load_page(0)['images'][0]['result'].text == "zero\n"
+
+def test_jobs_are_keyed_by_document_and_settings(pdf_path, tmp_path):
+    journal = open_journal(pdf_path, tmp_path)
+    journal.record(page(0, "zero"))
+    assert open_journal(pdf_path, tmp_path, lang='deu').done_pages() == set()
+
+    other = tmp_path / "other.pdf"
+    other.write_bytes(b"%PDF-1.7 a different document")
+    assert open_journal(str(other), tmp_path).done_pages() == set()
+
+def test_remove(pdf_path, tmp_path):
+    journal = open_journal(pdf_path, tmp_path)
+    journal.record(page(0, "zero"))
+    journal.remove()
+    assert open_journal(pdf_path, tmp_path).done_pages() == set()
+    journal.remove() # Already gone: no error
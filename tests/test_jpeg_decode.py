@@ -0,0 +1,68 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from ocr_engine import OCREngine, OCROptions, decode_jpeg_gray, pdf_image_placements
+
+fitz = pytest.importorskip("fitz")
+
+def scan(width=2400, height=1600):
+    img = np.full((height, width), 230, np.uint8)
+    cv2.rectangle(img, (width // 4, height // 4), (width // 2, height // 2), 20, -1)
+    return img
+
+def jpeg_bytes(img, mode=None):
+    out = io.BytesIO()
+    pil = Image.fromarray(img)
+    (pil.convert(mode) if mode else pil).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+def image_entry(width, height):
+    """The (xref, smask, width, height, ...) part of a page.get_images() entry that is read."""
+    return (0, 0, width, height)
+
+def placed(width_pt, height_pt, rotate=False):
+    # Turned a quarter: the image's x axis runs down the page
+    matrix = fitz.Matrix(0, width_pt, -height_pt, 0, 0, 0) if rotate else fitz.Matrix(width_pt, 0, 0, height_pt, 0, 0)
+    return (fitz.Rect(0, 0, width_pt, height_pt), matrix)
+
+@pytest.mark.parametrize("mode", [None, "RGB"])
+def test_draft_decodes_at_the_smallest_scale_still_large_enough(mode):
+    data = jpeg_bytes(scan(), mode)
+    assert decode_jpeg_gray(data).shape == (1600, 2400)
+    assert decode_jpeg_gray(data, (600, 400)).shape == (400, 600) # 1/4
+    assert decode_jpeg_gray(data, (700, 400)).shape == (800, 1200) # 1/4 would be too small
+    small = decode_jpeg_gray(data, (300, 200))
+    assert small.shape == (200, 300) and small.dtype == np.uint8
+    expected = cv2.resize(scan(), (300, 200), interpolation=cv2.INTER_AREA)
+    assert np.abs(small.astype(int) - expected.astype(int)).mean() < 4
+
+def test_cmyk_and_non_jpeg_data_are_left_to_mupdf():
+    assert decode_jpeg_gray(jpeg_bytes(scan(), "CMYK")) is None
+    png = cv2.imencode(".png", scan())[1].tobytes()
+    assert decode_jpeg_gray(png) is None
+
+def test_decode_size_follows_the_placement_dpi():
+    options = OCROptions(pdf_image_dpi=300)
+    img = image_entry(2400, 1600)
+    # 2400 px over 2 inches is 1200 dpi: decode at 300 dpi, a quarter of the size
+    assert OCREngine._jpeg_decode_size(img, [placed(144, 96)], options) == (600, 400)
+    assert OCREngine._jpeg_decode_size(img, [placed(144, 96, rotate=True)], options) == (600, 400)
+    # Under twice the target the image is decoded whole
+    assert OCREngine._jpeg_decode_size(img, [placed(360, 240)], options) is None
+    # The largest placement decides
+    assert OCREngine._jpeg_decode_size(img, [placed(144, 96), placed(360, 240)], options) is None
+    assert OCREngine._jpeg_decode_size(img, [], options) is None
+    assert OCREngine._jpeg_decode_size(img, [placed(144, 96)], OCROptions(pdf_image_dpi=150)) == (300, 200)
+
+def test_decode_size_of_an_image_placed_in_a_pdf():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(fitz.Rect(72, 72, 216, 168), stream=jpeg_bytes(scan())) # 2 x 1.33 inches
+    img = page.get_images(full=True)[0]
+    size = OCREngine._jpeg_decode_size(img, pdf_image_placements(page, img), OCROptions(pdf_image_dpi=300))
+    assert size == (600, 400)
+    assert decode_jpeg_gray(doc.xref_stream_raw(img[0]), size).shape == (400, 600)
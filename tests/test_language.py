@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import pytest
+
+import ocr_engine
+from ocr_engine import LanguageDetector, OCREngine, OCROptions
+
+TEXT = "A text layer comfortably longer than the minimum number of characters."
+
+@pytest.fixture
+def detector(monkeypatch):
+    calls = []
+
+    def fake_detect(text):
+        calls.append(text)
+        return 'fr'
+
+    monkeypatch.setattr(ocr_engine, 'langdetect_detect', fake_detect)
+    engine = SimpleNamespace(available_languages=['eng', 'fra'])
+    engine.installed_languages = lambda options: engine.available_languages
+    detector = LanguageDetector(engine)
+    detector.calls = calls
+    return detector
+
+def test_resolve_uses_installed_packs(detector):
+    options = OCROptions(lang='eng')
+    assert detector.resolve('fr', options) == ('fra', 'fra')
+    assert detector.resolve('de', options) == ('deu (Tesseract pack not installed)', 'eng')
+
+def test_resolve_falls_back_without_mapping_or_pack_list(detector):
+    options = OCROptions(lang='eng')
+    label, lang = detector.resolve('xx', options)
+    assert lang == 'eng' and label.startswith('xx ')
+    assert detector.resolve(None, options)[1] == 'eng'
+    detector.engine.available_languages = []
+    label, lang = detector.resolve('fr', options)
+    assert lang == 'eng' and label.startswith('fra ')
+
+def test_cached_code_is_shared_across_selected_languages(detector):
+    assert detector.detect(OCROptions(lang='eng'), text=TEXT, doc_key='doc') == ('fra', 'fra')
+    assert detector.is_cached('doc')
+    # Sampling does not depend on the selected language, only the fallback does
+    detector.engine.available_languages = ['eng', 'deu']
+    assert detector.detect(OCROptions(lang='deu'), doc_key='doc') == ('fra (Tesseract pack not installed)', 'deu')
+    assert len(detector.calls) == 1
+
+def test_cached_code_is_resolved_against_current_packs(detector):
+    options = OCROptions(lang='eng')
+    detector.detect(options, text=TEXT, doc_key='doc')
+    detector.engine.available_languages = ['eng']
+    assert detector.detect(options, doc_key='doc') == ('fra (Tesseract pack not installed)', 'eng')
+
+def test_cache_drops_least_recently_used(detector):
+    detector.max_cached = 2
+    options = OCROptions(lang='eng')
+    for doc_key in ['a', 'b']:
+        detector.detect(options, text=TEXT, doc_key=doc_key)
+    detector.detect(options, doc_key='a') # Refreshes 'a'
+    detector.detect(options, text=TEXT, doc_key='c')
+    assert [detector.is_cached(k) for k in ['a', 'b', 'c']] == [True, False, True]
+
+def test_engine_asks_the_selected_backend(monkeypatch):
+    engine = OCREngine()
+    asked = []
+
+    class Backend:
+        def get_languages(self):
+            asked.append(True)
+            return ['eng', 'rus', 'osd']
+
+    monkeypatch.setattr(engine, 'get_backend', lambda name: Backend())
+    options = OCROptions(lang='eng')
+    assert engine.installed_languages(options) == ['eng', 'rus', 'osd']
+    assert engine.lang_for_script('Cyrillic', 'eng', options) == 'rus'
+    engine.installed_languages(options)
+    assert len(asked) == 1
+    engine.available_languages = ['eng']
+    assert engine.lang_for_script('Cyrillic', 'eng', options) == 'eng'
+
+def test_failing_backend_reports_no_languages(monkeypatch):
+    engine = OCREngine()
+
+    class Backend:
+        def get_languages(self):
+            raise OSError("no tesseract")
+
+    monkeypatch.setattr(engine, 'get_backend', lambda name: Backend())
+    assert engine.installed_languages(OCROptions()) == []
@@ -0,0 +1,44 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from ocr_engine import encode_netpbm
+
+def decode(data):
+    return np.asarray(Image.open(io.BytesIO(data)))
+
+@pytest.mark.parametrize("width", [1, 7, 8, 9, 13])
+def test_black_and_white_is_packed_pbm(width):
+    img = np.where(np.random.default_rng(width).random((5, width)) < 0.5, 0, 255).astype(np.uint8)
+    data = encode_netpbm(img)
+    header = f"P4\n{width} 5\n".encode('ascii')
+    assert data.startswith(header)
+    # Rows are padded to whole bytes, 1 meaning black
+    assert len(data) == len(header) + 5 * -(-width // 8)
+    assert ((decode(data) == 0) == (img == 0)).all()
+
+@pytest.mark.parametrize("width", [1, 7, 13])
+def test_grayscale_is_pgm(width):
+    img = np.arange(3 * width, dtype=np.uint8).reshape(3, width) * 5 + 1
+    data = encode_netpbm(img)
+    header = f"P5\n{width} 3\n255\n".encode('ascii')
+    assert data == header + img.tobytes()
+    assert (decode(data) == img).all()
+
+def test_colour_is_ppm_and_alpha_is_flattened_onto_white():
+    img = np.random.default_rng(0).integers(0, 256, (4, 7, 3), dtype=np.uint8)
+    data = encode_netpbm(Image.fromarray(img))
+    assert data.startswith(b"P6\n7 4\n255\n")
+    assert (decode(data) == img).all()
+
+    rgba = Image.new('RGBA', (3, 2), (0, 0, 0, 0))
+    assert (decode(encode_netpbm(rgba)) == 255).all()
+
+def test_non_contiguous_arrays_and_bilevel_images():
+    img = np.arange(60, dtype=np.uint8).reshape(6, 10)[:, ::3] # A strided view, 4 columns wide
+    assert (decode(encode_netpbm(img)) == img).all()
+    bilevel = Image.new('1', (11, 3), 1)
+    assert encode_netpbm(bilevel).startswith(b"P4\n11 3\n")
+    assert (decode(encode_netpbm(bilevel)) != 0).all()
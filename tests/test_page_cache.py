@@ -0,0 +1,119 @@
+import glob
+
+import pytest
+
+import ocr_engine
+from ocr_engine import (OCREngine, OCROptions, OCRResult, OCRWord, PDFImageMemo, PDFPageCache, PDFRunStats,
+                        pdf_page_fingerprint, stream_pdf_ocr)
+
+fitz = pytest.importorskip("fitz")
+
+FONTS = sorted(glob.glob("/usr/share/fonts/truetype/**/*.ttf", recursive=True))
+
+def make_doc(texts, extra_pages=0):
+    """One page per text; extra_pages blank pages first shift every object number."""
+    doc = fitz.open()
+    for _ in range(extra_pages):
+        doc.new_page()
+    for text in texts:
+        doc.new_page().insert_text((72, 72), text)
+    return doc
+
+def fingerprint(doc, page_num):
+    return pdf_page_fingerprint(doc, doc[page_num], PDFImageMemo())
+
+def test_identical_pages_match_across_documents():
+    a = make_doc(["first page", "second page"])
+    b = make_doc(["second page", "first page"], extra_pages=3)
+    assert fingerprint(a, 0) == fingerprint(b, 4)
+    assert fingerprint(a, 1) == fingerprint(b, 3)
+    assert fingerprint(a, 0) != fingerprint(a, 1)
+
+def test_annotations_change_the_fingerprint():
+    doc = make_doc(["page", "page", "page"])
+    doc[1].add_text_annot((100, 100), "a note")
+    doc[2].add_text_annot((100, 100), "another note")
+    assert len({fingerprint(doc, n) for n in range(3)}) == 3
+
+@pytest.mark.skipif(not FONTS, reason="needs a TrueType font to embed")
+def test_embedded_font_program_changes_the_fingerprint():
+    docs = []
+    for _ in range(2):
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_font(fontname="F0", fontfile=FONTS[0])
+        page.insert_text((72, 72), "same text", fontname="F0")
+        docs.append(doc)
+    assert fingerprint(docs[0], 0) == fingerprint(docs[1], 0)
+
+    # Same font name and content stream, different glyphs
+    font_xref = docs[1][0].get_fonts()[0][0]
+    descendant = int(docs[1].xref_get_key(font_xref, "DescendantFonts")[1].strip("[]").split()[0])
+    program = int(docs[1].xref_get_key(descendant, "FontDescriptor/FontFile2")[1].split()[0])
+    docs[1].update_stream(program, docs[1].xref_stream(program) + b"\0")
+    assert fingerprint(docs[0], 0) != fingerprint(docs[1], 0)
+
+def page_result(page_num, text):
+    return {
+        'page_num': page_num, 'regular_text': "", 'page_ocr': None, 'resumed': False,
+        'images': [{'index': 0, 'width': 100, 'height': 50, 'error': None, 'reused_from': None,
+                    'result': OCRResult([OCRWord(text, 0, 0, 10, 10, 90.0)])}],
+    }
+
+def test_page_cache_hit_miss_and_invalidation(tmp_path):
+    cache = PDFPageCache(str(tmp_path))
+    key = PDFPageCache.make_key("fingerprint", "lang=eng")
+    assert cache.get(key) is None
+    cache.put(key, page_result(3, "cached"))
+
+    hit = cache.get(key)
+    assert hit['unchanged'] and hit['page_num'] == 3
+    assert hit['images'][0]['result'].text == "cached\n"
+    assert 'reused_from' not in hit['images'][0]
+    # Other OCR settings or other page content are different entries
+    assert cache.get(PDFPageCache.make_key("fingerprint", "lang=deu")) is None
+    assert cache.get(PDFPageCache.make_key("other", "lang=eng")) is None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = OCREngine()
+    calls = []
+
+    def recognize(img, options, lang=None):
+        calls.append(img.shape)
+        return OCRResult([OCRWord(f"image{len(calls)}", 0, 0, 10, 10, 90.0)])
+
+    monkeypatch.setattr(engine, "recognize", recognize)
+    engine.calls = calls
+    return engine
+
+def scans_pdf(path, shades):
+    doc = fitz.open()
+    for shade in shades:
+        pix = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 120, 60), 0)
+        pix.set_rect(pix.irect, (shade,))
+        doc.new_page().insert_image(fitz.Rect(72, 72, 192, 132), stream=pix.tobytes("png"))
+    doc.save(path)
+    return path
+
+def test_stream_fingerprints_lazily_and_reuses_unchanged_pages(tmp_path, engine, monkeypatch):
+    options = OCROptions(auto_detect_lang=False, resume_jobs=False, cache_dir=str(tmp_path / "cache"),
+                         pdf_workers=1)
+    fingerprinted = []
+    fingerprint_page = ocr_engine.pdf_page_fingerprint
+    monkeypatch.setattr(ocr_engine, "pdf_page_fingerprint",
+                        lambda doc, page, memo: fingerprinted.append(page.number) or fingerprint_page(doc, page, memo))
+
+    blocks = stream_pdf_ocr(scans_pdf(str(tmp_path / "v1.pdf"), [40, 90, 140]), options, engine)
+    next(blocks) # The header comes before any page is looked at
+    assert fingerprinted == []
+    list(blocks)
+    assert fingerprinted == [0, 1, 2] and len(engine.calls) == 3
+
+    # A re-issued version with the middle page changed
+    stats = PDFRunStats()
+    text = "".join(stream_pdf_ocr(scans_pdf(str(tmp_path / "v2.pdf"), [40, 200, 140]), options, engine, stats))
+    assert len(engine.calls) == 4
+    assert stats.pages_unchanged == 2
+    assert "image1" in text and "image4" in text and "image2" not in text
@@ -0,0 +1,67 @@
+import pytest
+
+from ocr_engine import OCREngine, OCROptions, OCRResult, OCRWord, PDFImageMemo
+
+fitz = pytest.importorskip("fitz")
+
+def png(shade, width=120, height=60):
+    pix = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, width, height), 0)
+    pix.set_rect(pix.irect, (shade,))
+    return pix.tobytes("png")
+
+@pytest.fixture
+def doc():
+    """Ten pages, each with the same logo (one xref) and its own scan."""
+    doc = fitz.open()
+    logo = None
+    for page_num in range(10):
+        page = doc.new_page()
+        if logo is None:
+            logo = page.insert_image(fitz.Rect(72, 36, 192, 96), stream=png(0, 121))
+        else:
+            page.insert_image(fitz.Rect(72, 36, 192, 96), xref=logo)
+        page.insert_image(fitz.Rect(72, 200, 192, 260), stream=png(20 + page_num))
+    yield doc
+    doc.close()
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = OCREngine()
+    calls = []
+
+    def recognize(img, options, lang=None):
+        calls.append(img.shape)
+        return OCRResult([OCRWord(f"image{len(calls)}", 0, 0, 10, 10, 90.0)])
+
+    monkeypatch.setattr(engine, "recognize", recognize)
+    engine.calls = calls
+    return engine
+
+def test_repeats_are_reused_and_single_images_forgotten(doc, engine):
+    memo = PDFImageMemo(keep_pages=2)
+    options = OCROptions(use_cache=False)
+    pages = [engine.ocr_pdf_page(doc, page_num, options, "eng", memo) for page_num in range(len(doc))]
+
+    assert len(engine.calls) == 1 + len(doc) # The logo once, every scan once
+    for page in pages[1:]:
+        logo = page['images'][0]
+        assert logo['reused_from'] == 0
+        assert logo['result'].text == "image1\n"
+    # The logo plus only the scans still inside the keep_pages window
+    assert len(memo.results) <= 1 + memo.keep_pages + 1
+
+def test_image_repeating_within_the_window_is_kept():
+    memo = PDFImageMemo(keep_pages=2)
+    memo.start_page()
+    memo.add("scan", 0)
+    memo.results["scan"] = (None, None)
+    memo.start_page()
+    memo.start_page()
+    assert memo.repeat("scan")
+    for _ in range(5):
+        memo.start_page()
+    assert "scan" in memo.results
+    memo.add("once", 7)
+    for _ in range(3):
+        memo.start_page()
+    assert not memo.repeat("once")
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+from ocr_engine import OCREngine, OCROptions, ThreadPlan, ocr_pdf_pages
+
+fitz = pytest.importorskip("fitz")
+pytesseract = pytest.importorskip("pytesseract")
+
+# Stands in for tesseract: answers --list-langs and prints one word per image as TSV
+FAKE_TESSERACT = """#!{python}
+import sys
+if '--list-langs' in sys.argv:
+    print('List of available languages in "/fake/tessdata/" (2):')
+    print('eng')
+    print('osd')
+    sys.exit(0)
+sys.stdin.buffer.read()
+print('level\\tpage_num\\tblock_num\\tpar_num\\tline_num\\tword_num\\tleft\\ttop\\twidth\\theight\\tconf\\ttext')
+print('5\\t1\\t1\\t1\\t1\\t1\\t0\\t0\\t10\\t10\\t95\\tfake')
+"""
+
+@pytest.fixture
+def fake_tesseract(tmp_path, monkeypatch):
+    path = tmp_path / "bin" / "my-tesseract"
+    path.parent.mkdir()
+    path.write_text(FAKE_TESSERACT.format(python=sys.executable))
+    path.chmod(0o755)
+    # Only reachable through tesseract_cmd, never through PATH
+    monkeypatch.setenv("PATH", str(tmp_path / "empty"))
+    monkeypatch.setattr(pytesseract.pytesseract, "tesseract_cmd", str(path))
+    return str(path)
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    doc = fitz.open()
+    for shade in (40, 90, 140):
+        page = doc.new_page()
+        pix = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 120, 60), 0)
+        pix.set_rect(pix.irect, (shade,))
+        page.insert_image(fitz.Rect(72, 72, 192, 132), stream=pix.tobytes("png"))
+    path = str(tmp_path / "scans.pdf")
+    doc.save(path)
+    return path
+
+@pytest.mark.skipif(os.name == "nt", reason="the fake tesseract is a script with a shebang line")
+def test_workers_use_the_configured_tesseract_cmd(fake_tesseract, pdf_path):
+    options = OCROptions(backend="subprocess", auto_detect_lang=False, use_cache=False, resume_jobs=False)
+    plan = ThreadPlan(workers=2, omp_threads=1, cv2_threads=1, cpu_count=2)
+    engine = OCREngine()
+    with fitz.open(pdf_path) as doc:
+        pages = list(ocr_pdf_pages(pdf_path, doc, options, "eng", engine, plan))
+    assert [page['page_num'] for page in pages] == [0, 1, 2]
+    for page in pages:
+        entry = page['images'][0]
+        assert entry['error'] is None
+        assert entry['result'].text == "fake\n"
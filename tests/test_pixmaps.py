@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from ocr_engine import pixmap_to_array
+
+fitz = pytest.importorskip("fitz")
+
+def filled(colorspace, width, height, alpha, value):
+    pix = fitz.Pixmap(colorspace, fitz.IRect(0, 0, width, height), alpha)
+    pix.set_rect(pix.irect, value)
+    return pix
+
+def test_grayscale_is_a_read_only_view():
+    img = pixmap_to_array(filled(fitz.csGRAY, 3, 2, 0, (77,)))
+    assert img.shape == (2, 3)
+    assert (img == 77).all()
+    assert not img.flags.writeable
+
+def test_rgb_keeps_three_channels():
+    img = pixmap_to_array(filled(fitz.csRGB, 5, 3, 0, (10, 20, 30)))
+    assert img.shape == (3, 5, 3)
+    assert img[2, 4].tolist() == [10, 20, 30]
+
+def test_padded_rows_are_cut_by_stride():
+    # Two rows of 3 grey pixels, each padded to 4 bytes
+    samples = bytes([1, 2, 3, 0, 4, 5, 6, 0])
+    pix = SimpleNamespace(samples=samples, stride=4, width=3, height=2, n=1, alpha=0,
+                          colorspace=SimpleNamespace(n=1))
+    assert pixmap_to_array(pix).tolist() == [[1, 2, 3], [4, 5, 6]]
+
+def test_alpha_is_flattened_onto_white():
+    # Premultiplied half-transparent red
+    img = pixmap_to_array(filled(fitz.csRGB, 4, 2, 1, (128, 0, 0, 128)))
+    assert img.shape == (2, 4, 3)
+    assert img[0, 0].tolist() == [255, 127, 127]
+    clear = pixmap_to_array(filled(fitz.csGRAY, 4, 2, 1, (0, 0)))
+    assert (clear == 255).all()
+
+def test_image_mask_marks_opaque_pixels_as_ink():
+    mask = fitz.Pixmap(None, filled(fitz.csGRAY, 4, 2, 1, (255, 255)))
+    img = pixmap_to_array(mask)
+    assert img.shape == (2, 4)
+    assert (img == 0).all()
+
+def test_cmyk_is_converted_to_grayscale():
+    img = pixmap_to_array(filled(fitz.csCMYK, 3, 2, 0, (0, 0, 0, 255)))
+    assert img.shape == (2, 3)
+    assert (img < 64).all()
+    assert np.unique(img).size == 1
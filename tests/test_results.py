@@ -0,0 +1,52 @@
+from ocr_engine import OCRResult
+
+HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext"
+
+def tsv(*rows):
+    return "\n".join([HEADER] + ["\t".join(str(v) for v in row) for row in rows]) + "\n"
+
+def word(block, par, line, num, left, text, conf=90):
+    return (5, 1, block, par, line, num, left, 10 * line, 30, 12, conf, text)
+
+def test_from_tsv_keeps_only_words():
+    result = OCRResult.from_tsv(tsv(
+        (1, 1, 0, 0, 0, 0, 0, 0, 200, 100, -1), # Page row: no text column at all
+        (4, 1, 1, 1, 1, 0, 10, 10, 90, 12, -1, ""),
+        word(1, 1, 1, 1, 10, "Hello", 96.5),
+        word(1, 1, 1, 2, 50, "world", 91),
+        word(1, 1, 1, 3, 90, "   "), # Blank word rows are dropped
+    ))
+    assert [w.text for w in result.words] == ["Hello", "world"]
+    first = result.words[0]
+    assert (first.left, first.top, first.width, first.height, first.conf) == (10, 10, 30, 12, 96.5)
+    assert result.average_confidence == 93.75
+
+def test_from_tsv_without_header():
+    rows = tsv(word(1, 1, 1, 1, 10, "alone")).splitlines()[1:]
+    assert OCRResult.from_tsv("\n".join(rows)).text == "alone\n"
+
+def test_text_rebuilds_lines_and_paragraphs():
+    result = OCRResult.from_tsv(tsv(
+        word(1, 1, 1, 1, 10, "first"),
+        word(1, 1, 1, 2, 50, "line"),
+        word(1, 1, 2, 1, 10, "second"),
+        word(1, 2, 1, 1, 10, "new"),
+        word(1, 2, 1, 2, 50, "paragraph"),
+        word(2, 1, 1, 1, 10, "block"),
+    ))
+    assert result.text == "first line\nsecond\n\nnew paragraph\n\nblock\n"
+
+def test_empty_result():
+    result = OCRResult.from_tsv(HEADER + "\n")
+    assert result.text == ""
+    assert result.average_confidence == 0
+
+def test_rescale_and_round_trip():
+    result = OCRResult.from_tsv(tsv(word(1, 1, 1, 1, 10, "scaled")))
+    result.rescale(0.5)
+    assert result.words[0].box == (5, 5, 20, 11)
+    result.lang = "eng"
+    copy = OCRResult.from_dict(result.to_dict())
+    assert copy.text == result.text
+    assert copy.words[0].box == result.words[0].box
+    assert copy.lang == "eng"
@@ -0,0 +1,25 @@
+import pytest
+
+from ocr_engine import MAX_TESSERACT_THREADS, plan_threads
+
+@pytest.mark.parametrize("units, requested, cpus", [
+    (1, 0, 8), (3, 0, 8), (10, 0, 8), (100, 4, 8), (5, 16, 4), (7, 0, 1), (2, 0, 64),
+])
+def test_workers_times_threads_fit_the_cpus(units, requested, cpus):
+    plan = plan_threads(units, requested, cpu_count=cpus)
+    assert 1 <= plan.workers <= min(units, cpus)
+    assert plan.workers * plan.cv2_threads <= cpus
+    assert 1 <= plan.omp_threads <= min(plan.cv2_threads, MAX_TESSERACT_THREADS)
+
+def test_single_unit_gets_the_inner_threads():
+    plan = plan_threads(1, cpu_count=8)
+    assert (plan.workers, plan.omp_threads, plan.cv2_threads) == (1, MAX_TESSERACT_THREADS, 8)
+
+def test_many_units_get_one_worker_per_cpu():
+    plan = plan_threads(50, cpu_count=8)
+    assert (plan.workers, plan.omp_threads, plan.cv2_threads) == (8, 1, 1)
+
+def test_requested_workers_are_honoured_up_to_the_limits():
+    assert plan_threads(10, 3, cpu_count=8).workers == 3
+    assert plan_threads(2, 6, cpu_count=8).workers == 2
+    assert plan_threads(0, cpu_count=8).workers == 1
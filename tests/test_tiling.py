@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from ocr_engine import ImageProcessor, ImageTiler, OCRWord, rotate_right_angle
+
+@pytest.mark.parametrize("width, height", [(5000, 3000), (4096, 4096), (9000, 200), (100, 100)])
+def test_tile_cores_partition_the_image(width, height):
+    tiler = ImageTiler(tile_size=1800, overlap=300)
+    owners = np.zeros((height // 10, width // 10), np.int32)
+    for box, core in tiler.tile_boxes(width, height):
+        # The core lies inside its tile and the tile inside the image
+        assert 0 <= box[0] <= core[0] < core[2] <= box[2] <= width
+        assert 0 <= box[1] <= core[1] < core[3] <= box[3] <= height
+        assert box[2] - box[0] <= 1800 and box[3] - box[1] <= 1800
+        owners[core[1] // 10:core[3] // 10, core[0] // 10:core[2] // 10] += 1
+    assert (owners == 1).all()
+
+def test_dedupe_keeps_the_more_confident_copy():
+    words = [
+        OCRWord("seam", 100, 50, 60, 20, 80.0),
+        OCRWord("seam", 102, 51, 60, 20, 93.0), # Same word seen from the next tile
+        OCRWord("seam", 400, 50, 60, 20, 70.0), # Same text elsewhere on the page
+        OCRWord("other", 101, 50, 60, 20, 60.0), # Same place, different text
+    ]
+    kept = ImageTiler.dedupe(words)
+    assert [(w.text, w.left) for w in kept] == [("seam", 102), ("seam", 400), ("other", 101)]
+
+@pytest.mark.parametrize("skew, rotation", [(0, 90), (4.0, 0), (-12.5, 270), (7.0, 180)])
+def test_tiles_cut_from_the_source_match_the_straightened_page(skew, rotation):
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (700, 1000), dtype=np.uint8), (0, 0), 3)
+    page = rotate_right_angle(ImageProcessor().rotate(img, skew) if skew else img, rotation)
+    matrix, width, height = ImageTiler.page_transform(1000, 700, skew, rotation)
+    assert (height, width) == page.shape
+    for box in [(0, 0, 300, 250), (400, 100, 650, 420), (width - 200, height - 150, width, height)]:
+        for source in (img, Image.fromarray(img)):
+            tile = ImageTiler.cut_tile(source, box, matrix, 'linear')
+            expected = page[box[1]:box[3], box[0]:box[2]]
+            assert tile.shape == expected.shape
+            assert np.abs(tile.astype(int) - expected.astype(int))[2:-2, 2:-2].max() <= 1
+
+def test_overview_reduces_without_copying_the_full_image():
+    img = Image.new("L", (9000, 3000), 255)
+    overview = ImageTiler().overview(img, max_side=4096)
+    assert overview.size == (3000, 1000)
+    assert ImageTiler().overview(np.zeros((3000, 9000), np.uint8), max_side=4096).shape == (1000, 3000)
+    small = Image.new("L", (100, 100))
+    assert ImageTiler().overview(small) is small